@@ -36,6 +36,8 @@ import (
 // @name Authorization
 
 func main() {
+	setMaxProcsFromCgroup()
+
 	// Load configuration
 	cfg, err := config.Load()
 	if err != nil {
@@ -43,7 +45,12 @@ func main() {
 	}
 
 	// Initialize database
-	db, err := postgres.Open(cfg.DatabaseURL)
+	db, err := postgres.Open(cfg.DatabaseURL, postgres.PoolConfig{
+		MaxOpenConns:    cfg.DBMaxOpenConns,
+		MaxIdleConns:    cfg.DBMaxIdleConns,
+		ConnMaxLifetime: time.Duration(cfg.DBConnMaxLifetimeMin) * time.Minute,
+		ConnMaxIdleTime: time.Duration(cfg.DBConnMaxIdleTimeMin) * time.Minute,
+	})
 	if err != nil {
 		log.Fatalf("failed to open database: %v", err)
 	}
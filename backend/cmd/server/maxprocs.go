@@ -0,0 +1,43 @@
+package main
+
+import (
+	"log"
+	"os"
+	"runtime"
+	"strconv"
+	"strings"
+)
+
+// setMaxProcsFromCgroup lowers GOMAXPROCS to the container's CPU quota when
+// running under cgroup v2 limits. Without it the runtime schedules across
+// every host core and gets throttled by the CFS quota. An explicit
+// GOMAXPROCS environment variable always wins.
+func setMaxProcsFromCgroup() {
+	if os.Getenv("GOMAXPROCS") != "" {
+		return
+	}
+	data, err := os.ReadFile("/sys/fs/cgroup/cpu.max")
+	if err != nil {
+		return
+	}
+	fields := strings.Fields(string(data))
+	if len(fields) != 2 || fields[0] == "max" {
+		return
+	}
+	quota, err1 := strconv.ParseFloat(fields[0], 64)
+	period, err2 := strconv.ParseFloat(fields[1], 64)
+	if err1 != nil || err2 != nil || quota <= 0 || period <= 0 {
+		return
+	}
+	procs := int(quota / period)
+	if float64(procs) < quota/period {
+		procs++ // round partial CPUs up
+	}
+	if procs < 1 {
+		procs = 1
+	}
+	if procs < runtime.NumCPU() {
+		runtime.GOMAXPROCS(procs)
+		log.Printf("GOMAXPROCS set to %d from cgroup CPU quota", procs)
+	}
+}
@@ -28,9 +28,15 @@ type Config struct {
 	CORSOrigins                []string
 	Debug                      bool
 	MaxMessagesPerConversation int
+	UploadAccelRedirectPrefix  string
 
 	WSPingIntervalSec int
 	WSPongTimeoutSec  int
+
+	DBMaxOpenConns       int
+	DBMaxIdleConns       int
+	DBConnMaxLifetimeMin int
+	DBConnMaxIdleTimeMin int
 }
 
 func Load() (*Config, error) {
@@ -39,13 +45,16 @@ func Load() (*Config, error) {
 	dbUser := getEnv("POSTGRES_USER", "postgres")
 	dbPass := getEnv("POSTGRES_PASSWORD", "postgres")
 	dbName := getEnv("POSTGRES_DB", "zchat")
+	// Bound each connection attempt so startup ping retries and pool dials
+	// fail fast instead of waiting out the OS TCP connect timeout.
+	dbConnectTimeout := getEnvAsInt("DB_CONNECT_TIMEOUT_SEC", 5)
 
 	u := url.URL{
 		Scheme:   "postgres",
 		User:     url.UserPassword(dbUser, dbPass),
 		Host:     fmt.Sprintf("%s:%s", dbHost, dbPort),
 		Path:     dbName,
-		RawQuery: "sslmode=disable",
+		RawQuery: fmt.Sprintf("sslmode=disable&connect_timeout=%d", dbConnectTimeout),
 	}
 	dbURL := u.String()
 
@@ -67,9 +76,15 @@ func Load() (*Config, error) {
 		UploadDir:                  getEnv("UPLOAD_DIR", "uploads"),
 		Debug:                      getEnvAsBool("DEBUG", true),
 		MaxMessagesPerConversation: getEnvAsInt("MAX_MESSAGES_PER_CONVERSATION", 1000),
+		UploadAccelRedirectPrefix:  os.Getenv("UPLOAD_ACCEL_REDIRECT_PREFIX"),
 
 		WSPingIntervalSec: getEnvAsInt("WS_PING_INTERVAL_SEC", 30),
 		WSPongTimeoutSec:  getEnvAsInt("WS_PONG_TIMEOUT_SEC", 60),
+
+		DBMaxOpenConns:       getEnvAsInt("DB_MAX_OPEN_CONNS", 30),
+		DBMaxIdleConns:       getEnvAsInt("DB_MAX_IDLE_CONNS", 20),
+		DBConnMaxLifetimeMin: getEnvAsInt("DB_CONN_MAX_LIFETIME_MIN", 30),
+		DBConnMaxIdleTimeMin: getEnvAsInt("DB_CONN_MAX_IDLE_TIME_MIN", 5),
 	}
 
 	cors := getEnv("CORS_ORIGINS", "")
@@ -95,11 +95,3 @@ type PushSubscription struct {
 	UserAgent string    `db:"user_agent"`
 	CreatedAt time.Time `db:"created_at"`
 }
-
-// ConversationResponse is the rich DTO returned by conversation endpoints.
-type ConversationResponse struct {
-	*Conversation
-	Participants []User      `json:"participants"`
-	LastMessage  interface{} `json:"last_message"` // *service.MessageResponse, typed as any to avoid import cycle
-	UnreadCount  int         `json:"unread_count"`
-}
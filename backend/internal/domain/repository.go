@@ -10,11 +10,13 @@ type UserRepository interface {
 	GetByID(ctx context.Context, id int64) (*User, error)
 	GetByUsername(ctx context.Context, username string) (*User, error)
 	GetByEmail(ctx context.Context, email string) (*User, error)
+	GetUsernamesByIDs(ctx context.Context, ids []int64) (map[int64]string, error)
 	ListActive(ctx context.Context, offset, limit int) ([]*User, error)
 	ListOnline(ctx context.Context) ([]*User, error)
 	Update(ctx context.Context, u *User) error
 	SoftDelete(ctx context.Context, id int64) error
 	SetOnlineStatus(ctx context.Context, id int64, isOnline bool) error
+	SetOfflineMany(ctx context.Context, ids []int64) error
 	ResetAllOnlineStatus(ctx context.Context) error
 }
 
@@ -25,6 +27,7 @@ type ConversationRepository interface {
 	ListForUser(ctx context.Context, userID int64) ([]*Conversation, error)
 	MarkAsRead(ctx context.Context, conversationID, userID int64) error
 	GetUnreadCount(ctx context.Context, conversationID, userID int64) (int, error)
+	GetUnreadCounts(ctx context.Context, conversationIDs []int64, userID int64) (map[int64]int, error)
 	FindExistingDirect(ctx context.Context, participantIDs []int64) (*Conversation, error)
 	FindExistingGroup(ctx context.Context, participantIDs []int64) (*Conversation, error)
 }
@@ -40,7 +43,8 @@ type MessageRepository interface {
 	ListForConversation(ctx context.Context, conversationID int64, limit int) ([]*Message, error)
 	ListForConversationForUser(ctx context.Context, conversationID, userID int64, limit int) ([]*Message, error)
 	ListForConversationForUserBefore(ctx context.Context, conversationID, userID, beforeID int64, limit int) ([]*Message, error)
-	MarkAllReadInConversation(ctx context.Context, conversationID, senderExcludeID int64) error
+	ListLatestForConversationsForUser(ctx context.Context, conversationIDs []int64, userID int64) (map[int64]*Message, error)
+	MarkAllReadInConversation(ctx context.Context, conversationID, readerID int64) (bool, error)
 	PruneOld(ctx context.Context, conversationID int64, keepLimit int) error
 }
 
@@ -52,6 +56,8 @@ type UserDeletedMessageRepository interface {
 // ParticipantRepository defines operations around conversation participants.
 type ParticipantRepository interface {
 	ListParticipants(ctx context.Context, conversationID int64) ([]*User, error)
+	ListParticipantsForConversations(ctx context.Context, conversationIDs []int64) (map[int64][]*User, error)
+	ListParticipantIDs(ctx context.Context, conversationID int64) ([]int64, error)
 	IsParticipant(ctx context.Context, conversationID, userID int64) (bool, error)
 }
 
@@ -52,9 +52,16 @@ func AuthMiddleware(tokens *security.TokenService, users domain.UserRepository)
 				return
 			}
 
-			user, err := users.GetByUsername(r.Context(), sub)
+			// Prefer the primary-key lookup; tokens issued before the uid
+			// claim existed fall back to the username.
+			var user *domain.User
+			if uid, ok := security.UserIDFromClaims(claims); ok {
+				user, err = users.GetByID(r.Context(), uid)
+			} else {
+				user, err = users.GetByUsername(r.Context(), sub)
+			}
 			if err != nil {
-				log.Printf("AuthMiddleware: GetByUsername error for sub '%s': %v", sub, err)
+				log.Printf("AuthMiddleware: user lookup error for sub '%s': %v", sub, err)
 				http.Error(w, "user not found", http.StatusUnauthorized)
 				return
 			}
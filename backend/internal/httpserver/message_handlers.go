@@ -56,12 +56,7 @@ func handleCreateMessage(msgSvc *service.MessageService) http.HandlerFunc {
 			return
 		}
 
-		resp, err := msgSvc.ToResponse(r.Context(), msg)
-		if err != nil {
-			writeJSON(w, http.StatusInternalServerError, map[string]string{"error": err.Error()})
-			return
-		}
-		writeJSON(w, http.StatusCreated, resp)
+		writeJSON(w, http.StatusCreated, msgSvc.ToAuthoredResponse(msg, currentUser.Username, req.Content))
 	}
 }
 
@@ -145,12 +140,8 @@ func handleEditMessage(msgSvc *service.MessageService) http.HandlerFunc {
 			return
 		}
 
-		resp, err := msgSvc.ToResponse(r.Context(), msg)
-		if err != nil {
-			writeJSON(w, http.StatusInternalServerError, map[string]string{"error": err.Error()})
-			return
-		}
-		writeJSON(w, http.StatusOK, resp)
+		// Only the sender may edit, so the caller is the sender.
+		writeJSON(w, http.StatusOK, msgSvc.ToAuthoredResponse(msg, currentUser.Username, req.Content))
 	}
 }
 
@@ -168,9 +159,9 @@ func handleDeleteMessage(msgSvc *service.MessageService) http.HandlerFunc {
 			return
 		}
 
-		deleteType := r.URL.Query().Get("delete_type")
+		deleteType := service.DeleteType(r.URL.Query().Get("delete_type"))
 		if deleteType == "" {
-			deleteType = "for_me"
+			deleteType = service.DeleteForMe
 		}
 
 		msg, err := msgSvc.DeleteMessage(r.Context(), currentUser.ID, msgID, deleteType)
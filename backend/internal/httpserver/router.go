@@ -1,9 +1,12 @@
 package httpserver
 
 import (
+	"bytes"
 	"database/sql"
 	"encoding/json"
 	"net/http"
+	"strconv"
+	"sync"
 	"time"
 
 	"github.com/go-chi/chi/v5"
@@ -28,7 +31,11 @@ func NewRouter(cfg *config.Config, db *sql.DB, hub *ws.Hub, tokenSvc *security.T
 	// Middlewares
 	r.Use(middleware.RequestID)
 	r.Use(middleware.RealIP)
-	r.Use(middleware.Logger)
+	// Per-request access logging formats and writes a line for every
+	// request; keep it to debug deployments.
+	if cfg.Debug {
+		r.Use(middleware.Logger)
+	}
 	r.Use(middleware.Recoverer)
 	r.Use(middleware.Timeout(60 * time.Second))
 
@@ -96,6 +103,10 @@ func NewRouter(cfg *config.Config, db *sql.DB, hub *ws.Hub, tokenSvc *security.T
 
 	// API routes
 	r.Route("/api", func(r chi.Router) {
+		// Compress JSON only; uploads are already-compressed media in most
+		// cases and are served with their own content types.
+		r.Use(middleware.Compress(5, "application/json"))
+
 		// Auth routes (no auth required)
 		r.Route("/auth", func(r chi.Router) {
 			r.Post("/register", handleRegister(authSvc, userSvc))
@@ -141,11 +152,13 @@ func NewRouter(cfg *config.Config, db *sql.DB, hub *ws.Hub, tokenSvc *security.T
 			r.Delete("/push/unsubscribe", handlePushUnsubscribe(pushSubRepo))
 
 		})
-
-		// Moved outside of AuthMiddleware group to allow download via ?token= query param
-		r.Mount("/uploads", UploadRoutes(cfg, db, tokenSvc))
 	})
 
+	// Uploads sit outside the AuthMiddleware group to allow download via
+	// ?token= query param, and outside the /api Compress middleware, whose
+	// writer wrapper would stop http.ServeFile from using sendfile(2).
+	r.Mount("/api/uploads", UploadRoutes(cfg, db, tokenSvc))
+
 	// WebSocket endpoint
 	pingInterval := time.Duration(cfg.WSPingIntervalSec) * time.Second
 	pongTimeout := time.Duration(cfg.WSPongTimeoutSec) * time.Second
@@ -154,11 +167,41 @@ func NewRouter(cfg *config.Config, db *sql.DB, hub *ws.Hub, tokenSvc *security.T
 	return r
 }
 
-// writeJSON is a small helper to send JSON responses.
+const maxPooledJSONBuf = 1 << 20
+
+// jsonBufPool recycles encode buffers across responses.
+var jsonBufPool = sync.Pool{
+	New: func() any { return new(bytes.Buffer) },
+}
+
+// writeJSON is a small helper to send JSON responses. The body is encoded
+// into a pooled buffer first so it goes out in a single write with a known
+// Content-Length, and an encoding failure can still produce a 500.
 func writeJSON(w http.ResponseWriter, status int, v any) {
 	w.Header().Set("Content-Type", "application/json")
-	w.WriteHeader(status)
-	if v != nil {
-		_ = json.NewEncoder(w).Encode(v)
+	if v == nil {
+		w.WriteHeader(status)
+		return
 	}
+
+	buf := jsonBufPool.Get().(*bytes.Buffer)
+	buf.Reset()
+	defer func() {
+		// Don't let one very large listing pin its buffer in the pool.
+		if buf.Cap() <= maxPooledJSONBuf {
+			jsonBufPool.Put(buf)
+		}
+	}()
+
+	if err := json.NewEncoder(buf).Encode(v); err != nil {
+		// Not http.Error: it would relabel the JSON body as text/plain.
+		body := []byte(`{"error":"failed to encode response"}` + "\n")
+		w.Header().Set("Content-Length", strconv.Itoa(len(body)))
+		w.WriteHeader(http.StatusInternalServerError)
+		_, _ = w.Write(body)
+		return
+	}
+	w.Header().Set("Content-Length", strconv.Itoa(buf.Len()))
+	w.WriteHeader(status)
+	_, _ = w.Write(buf.Bytes())
 }
@@ -2,12 +2,15 @@ package httpserver
 
 import (
 	"database/sql"
+	"errors"
 	"io"
 	"mime"
+	"mime/multipart"
 	"net/http"
 	"os"
 	"path/filepath"
 	"strings"
+	"sync"
 
 	"github.com/go-chi/chi/v5"
 	"github.com/google/uuid"
@@ -23,9 +26,23 @@ var forbiddenExtensions = map[string]struct{}{
 	".vbs": {}, ".js": {}, ".msi": {}, ".com": {},
 }
 
-// categoriseFileType maps a MIME type to a short category string.
+// extensionCategories resolves common extensions without consulting the
+// MIME table; categoriseFileType falls back to MIME sniffing for the rest.
+var extensionCategories = map[string]string{
+	".doc": "document", ".docx": "document", ".xls": "document",
+	".xlsx": "document", ".ppt": "document", ".pptx": "document",
+	".pdf": "document", ".txt": "document", ".md": "document",
+	".csv": "document",
+	".zip": "archive", ".tar": "archive", ".gz": "archive",
+	".rar": "archive", ".7z": "archive",
+}
+
+// categoriseFileType maps a file extension to a short category string.
 func categoriseFileType(ext string) string {
 	ext = strings.ToLower(ext)
+	if cat, ok := extensionCategories[ext]; ok {
+		return cat
+	}
 	mtype := mime.TypeByExtension(ext)
 	switch {
 	case strings.HasPrefix(mtype, "image/"):
@@ -38,51 +55,108 @@ func categoriseFileType(ext string) string {
 		strings.Contains(mtype, "word"),
 		strings.Contains(mtype, "openxmlformats"),
 		strings.Contains(mtype, "opendocument"),
-		strings.Contains(mtype, "text/"),
-		strings.Contains(mtype, "msword"),
-		strings.HasSuffix(ext, ".doc"),
-		strings.HasSuffix(ext, ".docx"),
-		strings.HasSuffix(ext, ".xls"),
-		strings.HasSuffix(ext, ".xlsx"),
-		strings.HasSuffix(ext, ".ppt"),
-		strings.HasSuffix(ext, ".pptx"),
-		strings.HasSuffix(ext, ".pdf"),
-		strings.HasSuffix(ext, ".txt"),
-		strings.HasSuffix(ext, ".md"),
-		strings.HasSuffix(ext, ".csv"):
+		strings.Contains(mtype, "text/"):
 		return "document"
 	case strings.Contains(mtype, "zip"),
 		strings.Contains(mtype, "tar"),
-		strings.Contains(mtype, "gzip"),
-		strings.Contains(mtype, "7z"),
-		strings.HasSuffix(ext, ".zip"),
-		strings.HasSuffix(ext, ".tar"),
-		strings.HasSuffix(ext, ".gz"),
-		strings.HasSuffix(ext, ".rar"),
-		strings.HasSuffix(ext, ".7z"):
+		strings.Contains(mtype, "7z"):
 		return "archive"
 	default:
 		return "file"
 	}
 }
 
+// maxUploadBodySize caps an upload request body: 50 MiB of file data plus
+// headroom for the multipart envelope. Enforced while streaming, so an
+// oversized upload is cut off instead of being written out in full.
+const maxUploadBodySize = 50<<20 + 64<<10
+
+// copyFilled copies src to dst, filling buf before each write. Multipart
+// parts return at most a few KiB per Read, so io.CopyBuffer would issue a
+// file write per read no matter how large the buffer is.
+func copyFilled(dst io.Writer, src io.Reader, buf []byte) (int64, error) {
+	var written int64
+	for {
+		n := 0
+		var err error
+		for n < len(buf) && err == nil {
+			var m int
+			m, err = src.Read(buf[n:])
+			n += m
+		}
+		if n > 0 {
+			w, werr := dst.Write(buf[:n])
+			written += int64(w)
+			if werr != nil {
+				return written, werr
+			}
+		}
+		if err == io.EOF {
+			return written, nil
+		}
+		if err != nil {
+			return written, err
+		}
+	}
+}
+
+func isBodyTooLarge(err error) bool {
+	var maxErr *http.MaxBytesError
+	return errors.As(err, &maxErr)
+}
+
+// uploadCopyBufPool holds 1 MiB buffers for streaming uploads to disk, so
+// large files are written in few syscalls without a fresh allocation per
+// request.
+var uploadCopyBufPool = sync.Pool{
+	New: func() any {
+		b := make([]byte, 1<<20)
+		return &b
+	},
+}
+
 // UploadRoutes returns a sub-router mounted at /api/uploads.
 func UploadRoutes(cfg *config.Config, db *sql.DB, tokenSvc *security.TokenService) chi.Router {
 	r := chi.NewRouter()
 
 	r.Post("/", func(w http.ResponseWriter, r *http.Request) {
-		if err := r.ParseMultipartForm(50 << 20); err != nil {
+		r.Body = http.MaxBytesReader(w, r.Body, maxUploadBodySize)
+
+		// Stream the "file" part straight to disk instead of letting
+		// ParseMultipartForm spool it to memory/temp first and copying again.
+		mr, err := r.MultipartReader()
+		if err != nil {
 			http.Error(w, "failed to parse multipart form", http.StatusBadRequest)
 			return
 		}
-		file, header, err := r.FormFile("file")
-		if err != nil {
+		var part *multipart.Part
+		for {
+			p, err := mr.NextPart()
+			if err == io.EOF {
+				break
+			}
+			if err != nil {
+				if isBodyTooLarge(err) {
+					http.Error(w, "file too large", http.StatusRequestEntityTooLarge)
+					return
+				}
+				http.Error(w, "failed to parse multipart form", http.StatusBadRequest)
+				return
+			}
+			if p.FormName() == "file" && p.FileName() != "" {
+				part = p
+				break
+			}
+			p.Close()
+		}
+		if part == nil {
 			http.Error(w, "missing file", http.StatusBadRequest)
 			return
 		}
-		defer file.Close()
+		defer part.Close()
+		originalName := part.FileName()
 
-		ext := strings.ToLower(filepath.Ext(header.Filename))
+		ext := strings.ToLower(filepath.Ext(originalName))
 		if ext == "" {
 			http.Error(w, "file must have an extension", http.StatusBadRequest)
 			return
@@ -94,26 +168,21 @@ func UploadRoutes(cfg *config.Config, db *sql.DB, tokenSvc *security.TokenServic
 
 		// Read first 512 bytes to detect content type
 		buf := make([]byte, 512)
-		n, err := file.Read(buf)
-		if err != nil && err != io.EOF {
+		n, err := io.ReadFull(part, buf)
+		if err != nil && err != io.EOF && err != io.ErrUnexpectedEOF {
+			if isBodyTooLarge(err) {
+				http.Error(w, "file too large", http.StatusRequestEntityTooLarge)
+				return
+			}
 			http.Error(w, "error reading file", http.StatusInternalServerError)
 			return
 		}
 		mimeType := http.DetectContentType(buf[:n])
-		// Rewind file pointer
-		if _, err := file.Seek(0, io.SeekStart); err != nil {
-			http.Error(w, "error processing file", http.StatusInternalServerError)
-			return
-		}
 
+		// config.Load creates UploadDir at startup.
 		filename := uuid.New().String() + ext
 		destPath := filepath.Join(cfg.UploadDir, filename)
 
-		if err := os.MkdirAll(cfg.UploadDir, 0755); err != nil {
-			http.Error(w, "could not create upload directory", http.StatusInternalServerError)
-			return
-		}
-
 		out, err := os.Create(destPath)
 		if err != nil {
 			http.Error(w, "could not create file", http.StatusInternalServerError)
@@ -121,25 +190,32 @@ func UploadRoutes(cfg *config.Config, db *sql.DB, tokenSvc *security.TokenServic
 		}
 		defer out.Close()
 
-		if _, err := io.Copy(out, file); err != nil {
+		// The sniffed prefix has already been consumed from the part, so
+		// write it first and then copy the rest through the pooled buffer.
+		_, err = out.Write(buf[:n])
+		var fileSize int64
+		if err == nil {
+			copyBuf := uploadCopyBufPool.Get().(*[]byte)
+			fileSize, err = copyFilled(out, part, *copyBuf)
+			uploadCopyBufPool.Put(copyBuf)
+			fileSize += int64(n)
+		}
+		if err != nil {
 			os.Remove(destPath)
+			if isBodyTooLarge(err) {
+				http.Error(w, "file too large", http.StatusRequestEntityTooLarge)
+				return
+			}
 			http.Error(w, "could not save file", http.StatusInternalServerError)
 			return
 		}
 
-		fileSize := header.Size
-		if fileSize == 0 {
-			if fi, err := out.Stat(); err == nil {
-				fileSize = fi.Size()
-			}
-		}
-
 		writeJSON(w, http.StatusOK, map[string]any{
 			"file_path":     "uploads/" + filename,
 			"file_type":     categoriseFileType(ext),
 			"filename":      filename,
 			"mime_type":     mimeType,
-			"original_name": header.Filename,
+			"original_name": originalName,
 			"file_size":     fileSize,
 		})
 	})
@@ -169,14 +245,35 @@ func UploadRoutes(cfg *config.Config, db *sql.DB, tokenSvc *security.TokenServic
 			return
 		}
 
-		// Try to fetch metadata from DB
+		// Count the read and fetch metadata in one statement. This runs
+		// before the conditional check so revalidated downloads are counted.
 		filePathKey := "uploads/" + filename
 		var originalName string
-		err := db.QueryRowContext(r.Context(), "SELECT original_name FROM attachments WHERE file_path = $1", filePathKey).Scan(&originalName)
+		err := db.QueryRowContext(r.Context(), `
+			UPDATE attachments SET read_count = read_count + 1
+			WHERE file_path = $1
+			RETURNING original_name
+		`, filePathKey).Scan(&originalName)
 		if err == nil && originalName != "" {
 			w.Header().Set("Content-Disposition", "attachment; filename=\""+originalName+"\"")
-			// Increment read_count
-			_, _ = db.ExecContext(r.Context(), "UPDATE attachments SET read_count = read_count + 1 WHERE file_path = $1", filePathKey)
+		}
+
+		// Upload filenames are random UUIDs and files are never rewritten,
+		// so the filename is a stable validator. "private" keeps shared
+		// caches from storing authenticated content.
+		etag := `"` + filename + `"`
+		w.Header().Set("Cache-Control", "private, max-age=31536000, immutable")
+		w.Header().Set("ETag", etag)
+		if r.Header.Get("If-None-Match") == etag {
+			w.WriteHeader(http.StatusNotModified)
+			return
+		}
+
+		// Let nginx stream the file itself when it fronts the uploads
+		// directory; the backend only authorises the request.
+		if cfg.UploadAccelRedirectPrefix != "" {
+			w.Header().Set("X-Accel-Redirect", cfg.UploadAccelRedirectPrefix+filename)
+			return
 		}
 
 		http.ServeFile(w, r, filepath.Join(cfg.UploadDir, filename))
@@ -1,6 +1,7 @@
 package security
 
 import (
+	"sync"
 	"time"
 
 	"github.com/golang-jwt/jwt/v5"
@@ -10,25 +11,30 @@ import (
 type TokenService struct {
 	secret    []byte
 	expiresIn time.Duration
+	verified  *claimsCache
 }
 
 func NewTokenService(secret string, expiresIn time.Duration) *TokenService {
 	return &TokenService{
 		secret:    []byte(secret),
 		expiresIn: expiresIn,
+		verified:  &claimsCache{entries: make(map[string]cachedClaims)},
 	}
 }
 
-// CreateForUser creates a JWT for the given username using the default TTL.
-func (t *TokenService) CreateForUser(username string) (string, error) {
-	return t.CreateWithTTL(username, t.expiresIn)
+// CreateForUser creates a JWT for the given user using the default TTL.
+func (t *TokenService) CreateForUser(userID int64, username string) (string, error) {
+	return t.CreateWithTTL(userID, username, t.expiresIn)
 }
 
-// CreateWithTTL creates a JWT for the given username with an explicit TTL.
-func (t *TokenService) CreateWithTTL(username string, ttl time.Duration) (string, error) {
+// CreateWithTTL creates a JWT for the given user with an explicit TTL.
+// The user ID is carried in the "uid" claim so callers can resolve the
+// user by primary key; "sub" keeps the username for older consumers.
+func (t *TokenService) CreateWithTTL(userID int64, username string, ttl time.Duration) (string, error) {
 	now := time.Now()
 	claims := jwt.MapClaims{
 		"sub": username,
+		"uid": userID,
 		"iat": now.Unix(),
 		"exp": now.Add(ttl).Unix(),
 	}
@@ -36,8 +42,23 @@ func (t *TokenService) CreateWithTTL(username string, ttl time.Duration) (string
 	return token.SignedString(t.secret)
 }
 
-// Parse validates a token and returns its claims.
+// Parse validates a token and returns its claims. Recently verified tokens
+// are answered from a cache, so the returned claims must be treated as
+// read-only.
 func (t *TokenService) Parse(tokenStr string) (jwt.MapClaims, error) {
+	now := time.Now()
+	if claims, ok := t.verified.get(tokenStr, now); ok {
+		return claims, nil
+	}
+	claims, err := t.parse(tokenStr)
+	if err != nil {
+		return nil, err
+	}
+	t.verified.put(tokenStr, claims, now)
+	return claims, nil
+}
+
+func (t *TokenService) parse(tokenStr string) (jwt.MapClaims, error) {
 	token, err := jwt.Parse(tokenStr, func(token *jwt.Token) (any, error) {
 		if _, ok := token.Method.(*jwt.SigningMethodHMAC); !ok {
 			return nil, jwt.ErrSignatureInvalid
@@ -55,3 +76,65 @@ func (t *TokenService) Parse(tokenStr string) (jwt.MapClaims, error) {
 	}
 	return nil, jwt.ErrTokenMalformed
 }
+
+// Verified tokens are trusted for at most claimsCacheTTL (and never past
+// their own expiry) before the signature is checked again. Clients reuse one
+// token for every API call, attachment download and WS reconnect.
+const (
+	claimsCacheTTL  = time.Minute
+	claimsCacheSize = 4096
+)
+
+// claimsCache maps a full token string to its verified claims. It is keyed by
+// the whole token rather than just the signature segment so a cache hit can
+// never pair a known signature with a different header or payload.
+type claimsCache struct {
+	mu      sync.Mutex
+	entries map[string]cachedClaims
+}
+
+type cachedClaims struct {
+	claims jwt.MapClaims
+	until  time.Time
+}
+
+func (c *claimsCache) get(token string, now time.Time) (jwt.MapClaims, bool) {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	e, ok := c.entries[token]
+	if !ok {
+		return nil, false
+	}
+	// Like the JWT exp check, a token is no longer valid at its expiry.
+	if !now.Before(e.until) {
+		delete(c.entries, token)
+		return nil, false
+	}
+	return e.claims, true
+}
+
+func (c *claimsCache) put(token string, claims jwt.MapClaims, now time.Time) {
+	until := now.Add(claimsCacheTTL)
+	if v, ok := claims["exp"].(float64); ok {
+		if exp := time.Unix(int64(v), 0); exp.Before(until) {
+			until = exp
+		}
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if len(c.entries) >= claimsCacheSize {
+		// Cheap bound: drop everything rather than tracking recency.
+		c.entries = make(map[string]cachedClaims)
+	}
+	c.entries[token] = cachedClaims{claims: claims, until: until}
+}
+
+// UserIDFromClaims returns the "uid" claim, if present. Tokens issued before
+// the claim was introduced only carry "sub".
+func UserIDFromClaims(claims jwt.MapClaims) (int64, bool) {
+	v, ok := claims["uid"].(float64)
+	if !ok || v <= 0 {
+		return 0, false
+	}
+	return int64(v), true
+}
@@ -0,0 +1,63 @@
+package security
+
+import (
+	"strconv"
+	"testing"
+	"time"
+
+	"github.com/golang-jwt/jwt/v5"
+	"github.com/stretchr/testify/assert"
+	"github.com/stretchr/testify/require"
+)
+
+func TestParseRejectsExpiredCachedToken(t *testing.T) {
+	svc := NewTokenService("secret", time.Hour)
+
+	token, err := svc.CreateWithTTL(1, "alice", time.Second)
+	require.NoError(t, err)
+
+	claims, err := svc.Parse(token)
+	require.NoError(t, err)
+	_, cached := svc.verified.get(token, time.Now())
+	require.True(t, cached)
+
+	exp := time.Unix(int64(claims["exp"].(float64)), 0)
+	time.Sleep(time.Until(exp) + 50*time.Millisecond)
+
+	_, err = svc.Parse(token)
+	assert.Error(t, err)
+}
+
+func TestClaimsCacheCapsLifetimeAtExp(t *testing.T) {
+	c := &claimsCache{entries: make(map[string]cachedClaims)}
+	now := time.Now()
+	exp := now.Add(10 * time.Second).Truncate(time.Second)
+	c.put("short", jwt.MapClaims{"exp": float64(exp.Unix())}, now)
+	c.put("long", jwt.MapClaims{"exp": float64(now.Add(time.Hour).Unix())}, now)
+
+	_, ok := c.get("short", exp.Add(-time.Millisecond))
+	assert.True(t, ok)
+	_, ok = c.get("short", exp)
+	assert.False(t, ok)
+
+	_, ok = c.get("long", now.Add(claimsCacheTTL-time.Millisecond))
+	assert.True(t, ok)
+	_, ok = c.get("long", now.Add(claimsCacheTTL))
+	assert.False(t, ok)
+}
+
+func TestClaimsCacheClearsWhenFull(t *testing.T) {
+	c := &claimsCache{entries: make(map[string]cachedClaims)}
+	now := time.Now()
+	for i := 0; i < claimsCacheSize; i++ {
+		c.put(strconv.Itoa(i), jwt.MapClaims{}, now)
+	}
+	assert.Len(t, c.entries, claimsCacheSize)
+
+	c.put("next", jwt.MapClaims{}, now)
+	assert.Len(t, c.entries, 1)
+	_, ok := c.get("0", now)
+	assert.False(t, ok)
+	_, ok = c.get("next", now)
+	assert.True(t, ok)
+}
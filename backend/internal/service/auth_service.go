@@ -170,7 +170,7 @@ func (s *AuthService) Login(ctx context.Context, in LoginInput) (*TokenResponse,
 	if in.RememberMe {
 		ttl = s.rememberMeTTL
 	}
-	token, err := s.tokens.CreateWithTTL(user.Username, ttl)
+	token, err := s.tokens.CreateWithTTL(user.ID, user.Username, ttl)
 	if err != nil {
 		return nil, fmt.Errorf("create token: %w", err)
 	}
@@ -47,6 +47,14 @@ func (m *MockUserRepo) GetByEmail(ctx context.Context, email string) (*domain.Us
 	return args.Get(0).(*domain.User), args.Error(1)
 }
 
+func (m *MockUserRepo) GetUsernamesByIDs(ctx context.Context, ids []int64) (map[int64]string, error) {
+	args := m.Called(ctx, ids)
+	if args.Get(0) == nil {
+		return nil, args.Error(1)
+	}
+	return args.Get(0).(map[int64]string), args.Error(1)
+}
+
 func (m *MockUserRepo) ListActive(ctx context.Context, offset, limit int) ([]*domain.User, error) {
 	return nil, nil // Not used in auth tests
 }
@@ -68,6 +76,10 @@ func (m *MockUserRepo) SetOnlineStatus(ctx context.Context, userID int64, isOnli
 	return args.Error(0)
 }
 
+func (m *MockUserRepo) SetOfflineMany(ctx context.Context, ids []int64) error {
+	return nil
+}
+
 func (m *MockUserRepo) ResetAllOnlineStatus(ctx context.Context) error {
 	return nil
 }
@@ -109,13 +109,54 @@ func (s *ConversationService) ListForUser(ctx context.Context, userID int64) ([]
 	if err != nil {
 		return nil, err
 	}
-	res := make([]*ConversationResponse, 0, len(convs))
-	for _, c := range convs {
-		r, err := s.toResponse(ctx, c, userID)
+	if len(convs) == 0 {
+		return []*ConversationResponse{}, nil
+	}
+
+	// Load participants, last messages and unread counts for all
+	// conversations up front instead of querying once per conversation.
+	convIDs := make([]int64, len(convs))
+	for i, c := range convs {
+		convIDs[i] = c.ID
+	}
+	participantsByConv, err := s.participants.ListParticipantsForConversations(ctx, convIDs)
+	if err != nil {
+		return nil, fmt.Errorf("list participants: %w", err)
+	}
+	lastByConv := map[int64]*MessageResponse{}
+	if s.msgSvc != nil {
+		latest, err := s.messages.ListLatestForConversationsForUser(ctx, convIDs, userID)
 		if err != nil {
-			return nil, err
+			return nil, fmt.Errorf("list latest messages: %w", err)
+		}
+		if len(latest) > 0 {
+			msgs := make([]*domain.Message, 0, len(latest))
+			for _, m := range latest {
+				msgs = append(msgs, m)
+			}
+			dtos, err := s.msgSvc.ToResponses(ctx, msgs)
+			if err != nil {
+				return nil, fmt.Errorf("build last messages: %w", err)
+			}
+			for i := range dtos {
+				lastByConv[dtos[i].ConversationID] = &dtos[i]
+			}
 		}
-		res = append(res, r)
+	}
+
+	unreadByConv, err := s.conversations.GetUnreadCounts(ctx, convIDs, userID)
+	if err != nil {
+		return nil, fmt.Errorf("get unread counts: %w", err)
+	}
+
+	res := make([]*ConversationResponse, 0, len(convs))
+	for _, c := range convs {
+		res = append(res, &ConversationResponse{
+			Conversation: c,
+			Participants: derefUsers(participantsByConv[c.ID]),
+			LastMessage:  lastByConv[c.ID],
+			UnreadCount:  unreadByConv[c.ID],
+		})
 	}
 	return res, nil
 }
@@ -130,14 +171,23 @@ func (s *ConversationService) GetConversation(
 		return nil, err
 	}
 
-	isParticipant, err := s.participants.IsParticipant(ctx, conversationID, userID)
+	// The response needs the participant list anyway; check membership
+	// against it instead of issuing a separate IsParticipant query.
+	users, err := s.participants.ListParticipants(ctx, conversationID)
 	if err != nil {
-		return nil, err
+		return nil, fmt.Errorf("list participants: %w", err)
+	}
+	isParticipant := false
+	for _, u := range users {
+		if u.ID == userID {
+			isParticipant = true
+			break
+		}
 	}
 	if !isParticipant {
 		return nil, errors.New("not a participant in this conversation")
 	}
-	return s.toResponse(ctx, conv, userID)
+	return s.responseWithParticipants(ctx, conv, users, userID), nil
 }
 
 func (s *ConversationService) MarkAsRead(
@@ -154,10 +204,12 @@ func (s *ConversationService) toResponse(ctx context.Context, conv *domain.Conve
 	if err != nil {
 		return nil, fmt.Errorf("list participants: %w", err)
 	}
-	participants := make([]domain.User, len(users))
-	for i, u := range users {
-		participants[i] = *u
-	}
+	return s.responseWithParticipants(ctx, conv, users, userID), nil
+}
+
+// responseWithParticipants is toResponse for callers that already loaded the participants.
+func (s *ConversationService) responseWithParticipants(ctx context.Context, conv *domain.Conversation, users []*domain.User, userID int64) *ConversationResponse {
+	participants := derefUsers(users)
 
 	unread, err := s.conversations.GetUnreadCount(ctx, conv.ID, userID)
 	if err != nil {
@@ -168,7 +220,16 @@ func (s *ConversationService) toResponse(ctx context.Context, conv *domain.Conve
 	if s.msgSvc != nil {
 		msgs, err := s.messages.ListForConversationForUser(ctx, conv.ID, userID, 1)
 		if err == nil && len(msgs) > 0 {
-			lastMsg, _ = s.msgSvc.ToResponse(ctx, msgs[0])
+			// The sender is normally among the loaded participants.
+			for _, u := range users {
+				if u.ID == msgs[0].SenderID {
+					lastMsg = s.msgSvc.ToSenderResponse(msgs[0], u.Username)
+					break
+				}
+			}
+			if lastMsg == nil {
+				lastMsg, _ = s.msgSvc.ToResponse(ctx, msgs[0])
+			}
 		}
 	}
 
@@ -177,5 +238,13 @@ func (s *ConversationService) toResponse(ctx context.Context, conv *domain.Conve
 		Participants: participants,
 		LastMessage:  lastMsg,
 		UnreadCount:  unread,
-	}, nil
+	}
+}
+
+func derefUsers(users []*domain.User) []domain.User {
+	res := make([]domain.User, len(users))
+	for i, u := range users {
+		res[i] = *u
+	}
+	return res
 }
@@ -4,8 +4,11 @@ import (
 	"context"
 	"errors"
 	"fmt"
+	"log"
 	"os"
 	"path/filepath"
+	"slices"
+	"sync"
 	"time"
 
 	"backend/internal/domain"
@@ -18,6 +21,12 @@ var (
 	ErrMessageDeleted = errors.New("message is already deleted")
 )
 
+// DefaultMessagePageSize is used when a message listing does not specify a limit.
+const DefaultMessagePageSize = 50
+
+// pruneTimeout bounds a background PruneOld run.
+const pruneTimeout = 30 * time.Second
+
 type MessageService struct {
 	conversations domain.ConversationRepository
 	participants  domain.ParticipantRepository
@@ -26,6 +35,8 @@ type MessageService struct {
 	users         domain.UserRepository
 	reactions     domain.MessageReactionRepository
 	encryptor     *security.Encryptor
+	memberCache   *participantCache
+	pruning       sync.Map // conversation ID → struct{} while a prune runs
 
 	MaxMessagesPerConversation int
 	UploadDir                  string
@@ -50,6 +61,7 @@ func NewMessageService(
 		users:                      users,
 		reactions:                  reactions,
 		encryptor:                  encryptor,
+		memberCache:                newParticipantCache(),
 		MaxMessagesPerConversation: maxMessages,
 		UploadDir:                  uploadDir,
 	}
@@ -73,14 +85,8 @@ func (s *MessageService) CreateMessage(
 		return nil, errors.New("message content exceeds 5000 characters")
 	}
 
-	conv, err := s.conversations.GetByID(ctx, in.ConversationID)
-	if err != nil {
-		return nil, fmt.Errorf("get conversation: %w", err)
-	}
-	if conv == nil {
-		return nil, errors.New("conversation not found")
-	}
-	isParticipant, err := s.participants.IsParticipant(ctx, in.ConversationID, senderID)
+	// Membership implies the conversation exists, so no separate lookup.
+	isParticipant, err := s.isParticipant(ctx, in.ConversationID, senderID)
 	if err != nil {
 		return nil, fmt.Errorf("check participant: %w", err)
 	}
@@ -113,14 +119,30 @@ func (s *MessageService) CreateMessage(
 	}
 
 	if s.MaxMessagesPerConversation > 0 {
-		if err := s.messages.PruneOld(ctx, in.ConversationID, s.MaxMessagesPerConversation); err != nil {
-			return nil, fmt.Errorf("prune old messages: %w", err)
-		}
+		s.pruneAsync(in.ConversationID)
 	}
 
 	return msg, nil
 }
 
+// pruneAsync trims a conversation to MaxMessagesPerConversation in the
+// background; the new message is already committed, so the sender doesn't
+// wait on the DELETEs. At most one prune per conversation runs at a time,
+// and a later message's prune catches up on anything a running one missed.
+func (s *MessageService) pruneAsync(conversationID int64) {
+	if _, running := s.pruning.LoadOrStore(conversationID, struct{}{}); running {
+		return
+	}
+	go func() {
+		defer s.pruning.Delete(conversationID)
+		ctx, cancel := context.WithTimeout(context.Background(), pruneTimeout)
+		defer cancel()
+		if err := s.messages.PruneOld(ctx, conversationID, s.MaxMessagesPerConversation); err != nil {
+			log.Printf("prune old messages in conversation %d: %v", conversationID, err)
+		}
+	}()
+}
+
 func (s *MessageService) EditMessage(
 	ctx context.Context,
 	callerID, messageID int64,
@@ -157,10 +179,18 @@ func (s *MessageService) EditMessage(
 	return msg, nil
 }
 
+// DeleteType selects how DeleteMessage removes a message.
+type DeleteType string
+
+const (
+	DeleteForMe       DeleteType = "for_me"
+	DeleteForEveryone DeleteType = "for_everyone"
+)
+
 func (s *MessageService) DeleteMessage(
 	ctx context.Context,
 	callerID, messageID int64,
-	deleteType string, // "for_me" | "for_everyone"
+	deleteType DeleteType,
 ) (*domain.Message, error) {
 	msg, err := s.messages.GetByID(ctx, messageID)
 	if err != nil {
@@ -171,7 +201,7 @@ func (s *MessageService) DeleteMessage(
 	}
 
 	switch deleteType {
-	case "for_everyone":
+	case DeleteForEveryone:
 		if msg.SenderID != callerID {
 			return nil, ErrForbidden
 		}
@@ -188,7 +218,7 @@ func (s *MessageService) DeleteMessage(
 				_ = os.Remove(filepath.Join(s.UploadDir, filepath.Base(att.FilePath)))
 			}
 		}
-	case "for_me":
+	case DeleteForMe:
 		if err := s.deletedMsgs.Create(ctx, callerID, messageID); err != nil {
 			return nil, fmt.Errorf("delete for me: %w", err)
 		}
@@ -212,7 +242,7 @@ func (s *MessageService) ListMessages(
 	if conv == nil {
 		return nil, errors.New("conversation not found")
 	}
-	isParticipant, err := s.participants.IsParticipant(ctx, conversationID, userID)
+	isParticipant, err := s.isParticipant(ctx, conversationID, userID)
 	if err != nil {
 		return nil, fmt.Errorf("check participant: %w", err)
 	}
@@ -220,9 +250,7 @@ func (s *MessageService) ListMessages(
 		return nil, errors.New("you are not a participant in this conversation")
 	}
 
-	if limit <= 0 || limit > s.MaxMessagesPerConversation {
-		limit = s.MaxMessagesPerConversation
-	}
+	limit = s.pageLimit(limit)
 
 	msgs, err := s.messages.ListForConversationForUser(ctx, conversationID, userID, limit)
 	if err != nil {
@@ -250,7 +278,7 @@ func (s *MessageService) ListMessagesBefore(
 	if conv == nil {
 		return nil, errors.New("conversation not found")
 	}
-	isParticipant, err := s.participants.IsParticipant(ctx, conversationID, userID)
+	isParticipant, err := s.isParticipant(ctx, conversationID, userID)
 	if err != nil {
 		return nil, fmt.Errorf("check participant: %w", err)
 	}
@@ -258,9 +286,7 @@ func (s *MessageService) ListMessagesBefore(
 		return nil, errors.New("you are not a participant in this conversation")
 	}
 
-	if limit <= 0 || limit > s.MaxMessagesPerConversation {
-		limit = s.MaxMessagesPerConversation
-	}
+	limit = s.pageLimit(limit)
 
 	msgs, err := s.messages.ListForConversationForUserBefore(ctx, conversationID, userID, beforeID, limit)
 	if err != nil {
@@ -274,28 +300,51 @@ func (s *MessageService) ListMessagesBefore(
 	return msgs, nil
 }
 
+// pageLimit clamps a requested page size to (0, MaxMessagesPerConversation],
+// defaulting to DefaultMessagePageSize when none was given.
+func (s *MessageService) pageLimit(limit int) int {
+	if limit <= 0 {
+		limit = DefaultMessagePageSize
+	}
+	if s.MaxMessagesPerConversation > 0 && limit > s.MaxMessagesPerConversation {
+		limit = s.MaxMessagesPerConversation
+	}
+	return limit
+}
+
 func (s *MessageService) MarkAllReadInConversation(ctx context.Context, conversationID, callerID int64) error {
-	isParticipant, err := s.participants.IsParticipant(ctx, conversationID, callerID)
+	isParticipant, err := s.messages.MarkAllReadInConversation(ctx, conversationID, callerID)
 	if err != nil {
-		return fmt.Errorf("check participant: %w", err)
+		return err
 	}
 	if !isParticipant {
 		return ErrForbidden
 	}
+	return nil
+}
 
-	return s.messages.MarkAllReadInConversation(ctx, conversationID, callerID)
+// isParticipant answers membership from the cached participant list, so the
+// hot message paths don't query conversation_participants per call.
+func (s *MessageService) isParticipant(ctx context.Context, conversationID, userID int64) (bool, error) {
+	ids, err := s.GetParticipantIDs(ctx, conversationID)
+	if err != nil {
+		return false, err
+	}
+	return slices.Contains(ids, userID), nil
 }
 
 // GetParticipantIDs returns user IDs of all conversation participants (for WS broadcasts).
+// Results are cached in memory; the returned slice must not be modified.
 func (s *MessageService) GetParticipantIDs(ctx context.Context, conversationID int64) ([]int64, error) {
-	participants, err := s.participants.ListParticipants(ctx, conversationID)
+	now := time.Now()
+	if ids, ok := s.memberCache.get(conversationID, now); ok {
+		return ids, nil
+	}
+	ids, err := s.participants.ListParticipantIDs(ctx, conversationID)
 	if err != nil {
 		return nil, err
 	}
-	ids := make([]int64, len(participants))
-	for i, p := range participants {
-		ids[i] = p.ID
-	}
+	s.memberCache.put(conversationID, ids, now)
 	return ids, nil
 }
 
@@ -319,6 +368,32 @@ type MessageResponse struct {
 
 // ToResponse converts a domain message into a decrypted response DTO.
 func (s *MessageService) ToResponse(ctx context.Context, m *domain.Message) (*MessageResponse, error) {
+	var username string
+	if u, err := s.users.GetByID(ctx, m.SenderID); err == nil && u != nil {
+		username = u.Username
+	}
+	res := s.buildResponse(m, username)
+	return &res, nil
+}
+
+// ToSenderResponse converts a message whose sender is already known (the
+// caller who just created or edited it), skipping the sender lookup.
+func (s *MessageService) ToSenderResponse(m *domain.Message, senderUsername string) *MessageResponse {
+	res := s.buildResponse(m, senderUsername)
+	return &res
+}
+
+// ToAuthoredResponse is ToSenderResponse for a message whose plaintext the
+// caller already has because it just created or edited it; it skips
+// decrypting the content that was encrypted a moment ago.
+func (s *MessageService) ToAuthoredResponse(m *domain.Message, senderUsername, plaintext string) *MessageResponse {
+	res := newResponse(m, senderUsername, plaintext)
+	return &res
+}
+
+// buildResponse decrypts m and assembles its DTO with an already-resolved
+// sender username.
+func (s *MessageService) buildResponse(m *domain.Message, username string) MessageResponse {
 	content := m.Content
 	if !m.IsDeleted {
 		dec, err := s.encryptor.Decrypt(m.Content)
@@ -327,11 +402,11 @@ func (s *MessageService) ToResponse(ctx context.Context, m *domain.Message) (*Me
 		}
 		// on decrypt error fall back to raw (mirrors Python behaviour)
 	}
-	var username string
-	if u, err := s.users.GetByID(ctx, m.SenderID); err == nil && u != nil {
-		username = u.Username
-	}
-	return &MessageResponse{
+	return newResponse(m, username, content)
+}
+
+func newResponse(m *domain.Message, username, content string) MessageResponse {
+	return MessageResponse{
 		ID:             m.ID,
 		Content:        content,
 		ConversationID: m.ConversationID,
@@ -346,18 +421,30 @@ func (s *MessageService) ToResponse(ctx context.Context, m *domain.Message) (*Me
 		ReplyToID:      m.ReplyToID,
 		Attachments:    m.Attachments,
 		Reactions:      m.Reactions,
-	}, nil
+	}
 }
 
-// ToResponses converts a slice of domain messages into response DTOs.
-func (s *MessageService) ToResponses(ctx context.Context, msgs []*domain.Message) ([]*MessageResponse, error) {
-	res := make([]*MessageResponse, 0, len(msgs))
+// ToResponses converts a slice of domain messages into response DTOs,
+// resolving all sender usernames with a single query. The DTOs are
+// returned by value in one contiguous slice rather than one allocation each.
+func (s *MessageService) ToResponses(ctx context.Context, msgs []*domain.Message) ([]MessageResponse, error) {
+	senderIDs := make([]int64, 0, len(msgs))
+	seen := make(map[int64]struct{}, len(msgs))
 	for _, m := range msgs {
-		dto, err := s.ToResponse(ctx, m)
-		if err != nil {
-			return nil, err
+		if _, ok := seen[m.SenderID]; ok {
+			continue
 		}
-		res = append(res, dto)
+		seen[m.SenderID] = struct{}{}
+		senderIDs = append(senderIDs, m.SenderID)
+	}
+	usernames, err := s.users.GetUsernamesByIDs(ctx, senderIDs)
+	if err != nil {
+		usernames = nil // non-fatal: usernames render empty, as in ToResponse
+	}
+
+	res := make([]MessageResponse, len(msgs))
+	for i, m := range msgs {
+		res[i] = s.buildResponse(m, usernames[m.SenderID])
 	}
 	return res, nil
 }
@@ -380,7 +467,7 @@ func (s *MessageService) ToggleReaction(ctx context.Context, userID, messageID i
 		return nil, 0, errors.New("cannot react to a deleted message")
 	}
 
-	isParticipant, err := s.participants.IsParticipant(ctx, msg.ConversationID, userID)
+	isParticipant, err := s.isParticipant(ctx, msg.ConversationID, userID)
 	if err != nil {
 		return nil, 0, fmt.Errorf("check participant: %w", err)
 	}
@@ -0,0 +1,30 @@
+package service
+
+import (
+	"testing"
+
+	"github.com/stretchr/testify/assert"
+)
+
+func TestPageLimit(t *testing.T) {
+	tests := []struct {
+		name  string
+		max   int
+		limit int
+		want  int
+	}{
+		{"ZeroUsesDefault", 1000, 0, DefaultMessagePageSize},
+		{"NegativeUsesDefault", 1000, -5, DefaultMessagePageSize},
+		{"WithinRange", 1000, 20, 20},
+		{"AtMax", 1000, 1000, 1000},
+		{"ClampedToMax", 1000, 5000, 1000},
+		{"DefaultClampedToSmallMax", 10, 0, 10},
+		{"NoMaxConfigured", 0, 5000, 5000},
+	}
+	for _, tt := range tests {
+		t.Run(tt.name, func(t *testing.T) {
+			s := &MessageService{MaxMessagesPerConversation: tt.max}
+			assert.Equal(t, tt.want, s.pageLimit(tt.limit))
+		})
+	}
+}
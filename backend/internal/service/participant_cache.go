@@ -0,0 +1,52 @@
+package service
+
+import (
+	"sync"
+	"time"
+)
+
+const (
+	participantCacheTTL  = 5 * time.Minute
+	participantCacheSize = 10000
+)
+
+// participantCache keeps conversation participant IDs in memory. Membership is
+// fixed when a conversation is created, so entries only expire to bound
+// memory; the returned slices are shared and must be treated as read-only.
+type participantCache struct {
+	mu      sync.RWMutex
+	entries map[int64]participantEntry
+}
+
+type participantEntry struct {
+	ids     []int64
+	expires time.Time
+}
+
+func newParticipantCache() *participantCache {
+	return &participantCache{entries: make(map[int64]participantEntry)}
+}
+
+func (c *participantCache) get(conversationID int64, now time.Time) ([]int64, bool) {
+	c.mu.RLock()
+	e, ok := c.entries[conversationID]
+	c.mu.RUnlock()
+	if !ok || now.After(e.expires) {
+		return nil, false
+	}
+	return e.ids, true
+}
+
+func (c *participantCache) put(conversationID int64, ids []int64, now time.Time) {
+	// An empty result usually means the conversation doesn't exist (yet);
+	// don't let it shadow a conversation created later with that ID.
+	if len(ids) == 0 {
+		return
+	}
+	c.mu.Lock()
+	defer c.mu.Unlock()
+	if len(c.entries) >= participantCacheSize {
+		c.entries = make(map[int64]participantEntry)
+	}
+	c.entries[conversationID] = participantEntry{ids: ids, expires: now.Add(participantCacheTTL)}
+}
@@ -0,0 +1,109 @@
+package service
+
+import (
+	"context"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/assert"
+	"github.com/stretchr/testify/mock"
+
+	"backend/internal/domain"
+)
+
+type MockParticipantRepo struct {
+	mock.Mock
+}
+
+func (m *MockParticipantRepo) ListParticipants(ctx context.Context, conversationID int64) ([]*domain.User, error) {
+	return nil, nil
+}
+
+func (m *MockParticipantRepo) ListParticipantsForConversations(ctx context.Context, conversationIDs []int64) (map[int64][]*domain.User, error) {
+	return nil, nil
+}
+
+func (m *MockParticipantRepo) ListParticipantIDs(ctx context.Context, conversationID int64) ([]int64, error) {
+	args := m.Called(ctx, conversationID)
+	if args.Get(0) == nil {
+		return nil, args.Error(1)
+	}
+	return args.Get(0).([]int64), args.Error(1)
+}
+
+func (m *MockParticipantRepo) IsParticipant(ctx context.Context, conversationID, userID int64) (bool, error) {
+	args := m.Called(ctx, conversationID, userID)
+	return args.Bool(0), args.Error(1)
+}
+
+func TestGetParticipantIDsCaches(t *testing.T) {
+	repo := new(MockParticipantRepo)
+	svc := &MessageService{participants: repo, memberCache: newParticipantCache()}
+
+	repo.On("ListParticipantIDs", mock.Anything, int64(1)).Return([]int64{10, 20}, nil).Once()
+
+	for i := 0; i < 3; i++ {
+		ids, err := svc.GetParticipantIDs(context.Background(), 1)
+		assert.NoError(t, err)
+		assert.Equal(t, []int64{10, 20}, ids)
+	}
+	repo.AssertNumberOfCalls(t, "ListParticipantIDs", 1)
+
+	ok, err := svc.isParticipant(context.Background(), 1, 20)
+	assert.NoError(t, err)
+	assert.True(t, ok)
+	ok, err = svc.isParticipant(context.Background(), 1, 30)
+	assert.NoError(t, err)
+	assert.False(t, ok)
+	repo.AssertNumberOfCalls(t, "ListParticipantIDs", 1)
+}
+
+func TestGetParticipantIDsDoesNotCacheEmpty(t *testing.T) {
+	repo := new(MockParticipantRepo)
+	svc := &MessageService{participants: repo, memberCache: newParticipantCache()}
+
+	// The conversation is created between the first and second lookup.
+	repo.On("ListParticipantIDs", mock.Anything, int64(2)).Return([]int64{}, nil).Once()
+	repo.On("ListParticipantIDs", mock.Anything, int64(2)).Return([]int64{10, 20}, nil).Once()
+
+	ids, err := svc.GetParticipantIDs(context.Background(), 2)
+	assert.NoError(t, err)
+	assert.Empty(t, ids)
+
+	ok, err := svc.isParticipant(context.Background(), 2, 10)
+	assert.NoError(t, err)
+	assert.True(t, ok)
+	repo.AssertNumberOfCalls(t, "ListParticipantIDs", 2)
+}
+
+func TestParticipantCacheExpiry(t *testing.T) {
+	c := newParticipantCache()
+	now := time.Now()
+	c.put(1, []int64{10, 20}, now)
+
+	ids, ok := c.get(1, now.Add(participantCacheTTL))
+	assert.True(t, ok)
+	assert.Equal(t, []int64{10, 20}, ids)
+
+	_, ok = c.get(1, now.Add(participantCacheTTL+time.Nanosecond))
+	assert.False(t, ok)
+}
+
+func TestParticipantCacheEvictsAtCapacity(t *testing.T) {
+	c := newParticipantCache()
+	now := time.Now()
+	for id := int64(1); id <= participantCacheSize; id++ {
+		c.put(id, []int64{id}, now)
+	}
+	_, ok := c.get(1, now)
+	assert.True(t, ok)
+	assert.Len(t, c.entries, participantCacheSize)
+
+	// The next insert finds the cache full and starts over.
+	c.put(participantCacheSize+1, []int64{1}, now)
+	_, ok = c.get(1, now)
+	assert.False(t, ok)
+	_, ok = c.get(participantCacheSize+1, now)
+	assert.True(t, ok)
+	assert.Len(t, c.entries, 1)
+}
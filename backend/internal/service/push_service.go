@@ -19,11 +19,16 @@ type NotificationPayload struct {
 	Tag   string `json:"tag"` // "msg" | "call"
 }
 
+// maxConcurrentPushes bounds the number of users being notified at once, so a
+// message to a large group can't open hundreds of outbound HTTPS requests.
+const maxConcurrentPushes = 100
+
 // PushService sends Web Push notifications via the VAPID protocol.
 type PushService struct {
 	vapidPrivateKey string
 	vapidPublicKey  string
 	repo            domain.PushSubscriptionRepository
+	sends           chan struct{} // semaphore, see maxConcurrentPushes
 }
 
 // NewPushService creates a PushService. vapidPriv and vapidPub must be base64url-encoded
@@ -33,6 +38,7 @@ func NewPushService(repo domain.PushSubscriptionRepository, vapidPriv, vapidPub
 		vapidPrivateKey: vapidPriv,
 		vapidPublicKey:  vapidPub,
 		repo:            repo,
+		sends:           make(chan struct{}, maxConcurrentPushes),
 	}
 }
 
@@ -79,9 +85,14 @@ func (p *PushService) NotifyUser(ctx context.Context, userID int64, payload Noti
 }
 
 // NotifyUsersAsync sends push notifications to multiple users asynchronously.
-// Each user is processed in a separate goroutine; errors are logged, not returned.
+// Each user is processed in a separate goroutine, at most maxConcurrentPushes
+// at a time; errors are logged, not returned.
 func (p *PushService) NotifyUsersAsync(userIDs []int64, payload NotificationPayload, urgency webpush.Urgency, ttl int) {
 	for _, uid := range userIDs {
-		go p.NotifyUser(context.Background(), uid, payload, urgency, ttl)
+		go func(uid int64) {
+			p.sends <- struct{}{}
+			defer func() { <-p.sends }()
+			p.NotifyUser(context.Background(), uid, payload, urgency, ttl)
+		}(uid)
 	}
 }
@@ -2,7 +2,6 @@ package service
 
 import (
 	"context"
-	"fmt"
 
 	"backend/internal/domain"
 )
@@ -35,23 +34,3 @@ func (s *UserService) SoftDelete(ctx context.Context, id int64) error {
 func (s *UserService) SetOnlineStatus(ctx context.Context, id int64, isOnline bool) error {
 	return s.users.SetOnlineStatus(ctx, id, isOnline)
 }
-
-// UserStats is a simplified version of the Python service stats.
-type UserStats struct {
-	UserID            int64  `json:"user_id"`
-	Username          string `json:"username"`
-	ConversationCount int    `json:"conversation_count"`
-	MessageCount      int    `json:"message_count"`
-}
-
-// GetStats would require additional queries; left as a placeholder.
-func (s *UserService) GetStats(ctx context.Context, user *domain.User) (*UserStats, error) {
-	if user == nil {
-		return nil, fmt.Errorf("user is nil")
-	}
-	// For now, return minimal stats; can be expanded with additional queries.
-	return &UserStats{
-		UserID:   user.ID,
-		Username: user.Username,
-	}, nil
-}
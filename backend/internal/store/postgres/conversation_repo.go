@@ -33,14 +33,13 @@ func (r *ConversationRepo) Create(ctx context.Context, c *domain.Conversation, p
 		return fmt.Errorf("insert conversation: %w", err)
 	}
 
-	for _, uid := range participantIDs {
-		if _, err := tx.ExecContext(ctx, `
-			INSERT INTO conversation_participants (user_id, conversation_id, joined_at)
-			VALUES ($1, $2, NOW())
-			ON CONFLICT DO NOTHING
-		`, uid, c.ID); err != nil {
-			return fmt.Errorf("insert participant %d: %w", uid, err)
-		}
+	// One statement for all participants instead of a round trip per member.
+	if _, err := tx.ExecContext(ctx, `
+		INSERT INTO conversation_participants (user_id, conversation_id, joined_at)
+		SELECT uid, $2, NOW() FROM unnest($1::bigint[]) AS uid
+		ON CONFLICT DO NOTHING
+	`, participantIDs, c.ID); err != nil {
+		return fmt.Errorf("insert participants: %w", err)
 	}
 
 	return tx.Commit()
@@ -109,6 +108,39 @@ func (r *ConversationRepo) GetUnreadCount(ctx context.Context, conversationID, u
 	return count, err
 }
 
+// GetUnreadCounts returns unread counts for several conversations in one
+// query. Conversations without unread messages are absent from the map.
+func (r *ConversationRepo) GetUnreadCounts(ctx context.Context, conversationIDs []int64, userID int64) (map[int64]int, error) {
+	res := make(map[int64]int, len(conversationIDs))
+	if len(conversationIDs) == 0 {
+		return res, nil
+	}
+	rows, err := r.db.QueryContext(ctx, `
+		SELECT m.conversation_id, COUNT(*) FROM messages m
+		JOIN conversation_participants cp
+		  ON cp.conversation_id = m.conversation_id AND cp.user_id = $2
+		WHERE m.conversation_id = ANY($1::bigint[])
+		  AND m.sender_id != $2
+		  AND m.is_read = FALSE
+		  AND m.is_deleted = FALSE
+		  AND (cp.last_read_at IS NULL OR m.created_at > cp.last_read_at)
+		GROUP BY m.conversation_id
+	`, conversationIDs, userID)
+	if err != nil {
+		return nil, fmt.Errorf("get unread counts: %w", err)
+	}
+	defer rows.Close()
+	for rows.Next() {
+		var convID int64
+		var count int
+		if err := rows.Scan(&convID, &count); err != nil {
+			return nil, fmt.Errorf("scan unread count: %w", err)
+		}
+		res[convID] = count
+	}
+	return res, rows.Err()
+}
+
 // FindExistingDirect finds a direct (non-group) conversation between exactly two users.
 func (r *ConversationRepo) FindExistingDirect(ctx context.Context, participantIDs []int64) (*domain.Conversation, error) {
 	if len(participantIDs) != 2 {
@@ -3,174 +3,286 @@ package postgres
 import (
 	"database/sql"
 	"fmt"
+	"hash/crc32"
 	"log"
+	"math/rand"
+	"strings"
+	"time"
 
 	_ "github.com/jackc/pgx/v5/stdlib"
 )
 
+// PoolConfig holds connection pool limits. database/sql keeps only two idle
+// connections by default, so bursts of requests would otherwise pay the
+// connect + auth handshake again. Lifetimes are bounded so connections
+// dropped by the server or a proxy after an idle period are recycled before
+// reuse. Zero values leave the database/sql default in place.
+type PoolConfig struct {
+	MaxOpenConns    int
+	MaxIdleConns    int
+	ConnMaxLifetime time.Duration
+	ConnMaxIdleTime time.Duration
+}
+
 // Open opens a PostgreSQL database using the pgx stdlib driver.
-func Open(dsn string) (*sql.DB, error) {
+func Open(dsn string, pool PoolConfig) (*sql.DB, error) {
 	db, err := sql.Open("pgx", dsn)
 	if err != nil {
 		return nil, fmt.Errorf("open postgres: %w", err)
 	}
-	if err := db.Ping(); err != nil {
+	if pool.MaxOpenConns > 0 {
+		db.SetMaxOpenConns(pool.MaxOpenConns)
+	}
+	if pool.MaxIdleConns > 0 {
+		db.SetMaxIdleConns(pool.MaxIdleConns)
+	}
+	if pool.ConnMaxLifetime > 0 {
+		db.SetConnMaxLifetime(pool.ConnMaxLifetime)
+	}
+	if pool.ConnMaxIdleTime > 0 {
+		db.SetConnMaxIdleTime(pool.ConnMaxIdleTime)
+	}
+	if err := pingWithBackoff(db); err != nil {
+		db.Close()
 		return nil, fmt.Errorf("ping postgres: %w", err)
 	}
 	return db, nil
 }
 
-// Migrate runs idempotent DDL migrations for the zchat schema on PostgreSQL.
-func Migrate(db *sql.DB) error {
-	log.Print("Migrating database...")
-	stmts := []string{
-		// Users
-		`CREATE TABLE IF NOT EXISTS users (
-			id               BIGSERIAL PRIMARY KEY,
-			username         VARCHAR(50)  UNIQUE NOT NULL,
-			email            VARCHAR(100) UNIQUE,
-			hashed_password  VARCHAR(255) NOT NULL,
-			is_active        BOOLEAN      NOT NULL DEFAULT TRUE,
-			is_online        BOOLEAN      NOT NULL DEFAULT FALSE,
-			created_at       TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
-			last_seen        TIMESTAMPTZ  NOT NULL DEFAULT NOW()
-		)`,
-
-		// Conversations
-		`CREATE TABLE IF NOT EXISTS conversations (
-			id         BIGSERIAL    PRIMARY KEY,
-			name       VARCHAR(100),
-			is_group   BOOLEAN      NOT NULL DEFAULT FALSE,
-			created_at TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
-			updated_at TIMESTAMPTZ  NOT NULL DEFAULT NOW()
-		)`,
-
-		// Conversation participants
-		`CREATE TABLE IF NOT EXISTS conversation_participants (
-			user_id         BIGINT       NOT NULL REFERENCES users(id),
-			conversation_id BIGINT       NOT NULL REFERENCES conversations(id),
-			last_read_at    TIMESTAMPTZ,
-			joined_at       TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
-			PRIMARY KEY (user_id, conversation_id)
-		)`,
-
-		// Messages
-		`CREATE TABLE IF NOT EXISTS messages (
-			id              BIGSERIAL    PRIMARY KEY,
-			content         TEXT         NOT NULL,
-			conversation_id BIGINT       NOT NULL REFERENCES conversations(id),
-			sender_id       BIGINT       NOT NULL REFERENCES users(id),
-			created_at      TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
-			file_path       TEXT,
-			file_type       TEXT,
-			fully_read_at   TIMESTAMPTZ,
-			is_deleted      BOOLEAN      NOT NULL DEFAULT FALSE,
-			is_edited       BOOLEAN      NOT NULL DEFAULT FALSE,
-			is_read         BOOLEAN      NOT NULL DEFAULT FALSE,
-			reply_to_id     BIGINT       REFERENCES messages(id)
-		)`,
-
-		// Add column if not exists (for existing DBs)
-		`DO $$ 
-		BEGIN 
-			IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='messages' AND column_name='reply_to_id') THEN 
-				ALTER TABLE messages ADD COLUMN reply_to_id BIGINT REFERENCES messages(id); 
-			END IF; 
-		END $$;`,
-
-		// Per-user soft deletes ("delete for me")
-		`CREATE TABLE IF NOT EXISTS user_deleted_messages (
-			user_id    BIGINT      NOT NULL REFERENCES users(id),
-			message_id BIGINT      NOT NULL REFERENCES messages(id),
-			deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-			PRIMARY KEY (user_id, message_id)
-		)`,
-
-		// Attachments
-		`CREATE TABLE IF NOT EXISTS attachments (
-			id            BIGSERIAL   PRIMARY KEY,
-			message_id    BIGINT      NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
-			file_path     TEXT        NOT NULL,
-			original_name TEXT        NOT NULL,
-			file_size     BIGINT      NOT NULL,
-			file_type     TEXT        NOT NULL,
-			mime_type     TEXT        NOT NULL,
-			read_count    INT         NOT NULL DEFAULT 0,
-			created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
-		)`,
-
-		// Indexes
-		`CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)`,
-		`CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)`,
-		`CREATE INDEX IF NOT EXISTS idx_users_is_online ON users(is_online)`,
-		`CREATE INDEX IF NOT EXISTS idx_conversations_is_group ON conversations(is_group)`,
-		`CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC)`,
-		`CREATE INDEX IF NOT EXISTS idx_conv_participants_user ON conversation_participants(user_id)`,
-		`CREATE INDEX IF NOT EXISTS idx_conv_participants_conv ON conversation_participants(conversation_id)`,
-		`CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id)`,
-		`CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id)`,
-		`CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at)`,
-		`CREATE INDEX IF NOT EXISTS idx_attachments_message_id ON attachments(message_id)`,
-
-		// Push subscriptions for Web Push notifications
-		`CREATE TABLE IF NOT EXISTS push_subscriptions (
-			id         BIGSERIAL   PRIMARY KEY,
-			user_id    BIGINT      NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-			endpoint   TEXT        NOT NULL,
-			p256dh     TEXT        NOT NULL,
-			auth       TEXT        NOT NULL,
-			user_agent TEXT,
-			created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-			UNIQUE (user_id, endpoint)
-		)`,
-		`CREATE INDEX IF NOT EXISTS idx_push_subscriptions_user ON push_subscriptions(user_id)`,
-
-		// Message reactions
-		`CREATE TABLE IF NOT EXISTS message_reactions (
-			id         BIGSERIAL    PRIMARY KEY,
-			message_id BIGINT       NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
-			user_id    BIGINT       NOT NULL REFERENCES users(id) ON DELETE CASCADE,
-			emoji      VARCHAR(32)  NOT NULL,
-			created_at TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
-			UNIQUE(message_id, user_id, emoji)
-		)`,
-		`CREATE INDEX IF NOT EXISTS idx_message_reactions_message ON message_reactions(message_id)`,
-
-		// Add new columns to existing tables if they were created by an older schema
-		`ALTER TABLE messages ADD COLUMN IF NOT EXISTS is_edited BOOLEAN NOT NULL DEFAULT FALSE`,
-		`ALTER TABLE messages ADD COLUMN IF NOT EXISTS is_read   BOOLEAN NOT NULL DEFAULT FALSE`,
-
-		// Ensure message FK in user_deleted_messages cascades on delete
-		`DO $$
-		BEGIN
-			IF EXISTS (
-				SELECT 1
-				FROM information_schema.table_constraints
-				WHERE table_schema = 'public'
-				  AND table_name = 'user_deleted_messages'
-				  AND constraint_type = 'FOREIGN KEY'
-				  AND constraint_name = 'user_deleted_messages_message_id_fkey'
-			) THEN
-				ALTER TABLE user_deleted_messages
-				DROP CONSTRAINT user_deleted_messages_message_id_fkey;
-			END IF;
+// The database may still be starting when the server does (compose, k8s).
+// Ping retries use exponential backoff with full jitter so that replicas
+// starting together don't probe PostgreSQL in lockstep.
+const (
+	pingBudget   = time.Minute
+	pingBaseWait = 100 * time.Millisecond
+	pingMaxWait  = 10 * time.Second
+)
+
+func pingWithBackoff(db *sql.DB) error {
+	deadline := time.Now().Add(pingBudget)
+	for attempt := 0; ; attempt++ {
+		err := db.Ping()
+		if err == nil {
+			return nil
+		}
+		ceiling := pingMaxWait
+		if attempt < 16 {
+			ceiling = min(pingBaseWait<<attempt, pingMaxWait)
+		}
+		wait := time.Duration(rand.Int63n(int64(ceiling)) + 1)
+		if time.Now().Add(wait).After(deadline) {
+			return err
+		}
+		log.Printf("postgres not ready (%v); retrying in %s", err, wait.Round(time.Millisecond))
+		time.Sleep(wait)
+	}
+}
+
+// migrations is the idempotent DDL for the zchat schema, in order.
+var migrations = []string{
+	// Users
+	`CREATE TABLE IF NOT EXISTS users (
+		id               BIGSERIAL PRIMARY KEY,
+		username         VARCHAR(50)  UNIQUE NOT NULL,
+		email            VARCHAR(100) UNIQUE,
+		hashed_password  VARCHAR(255) NOT NULL,
+		is_active        BOOLEAN      NOT NULL DEFAULT TRUE,
+		is_online        BOOLEAN      NOT NULL DEFAULT FALSE,
+		created_at       TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+		last_seen        TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+	)`,
+
+	// Conversations
+	`CREATE TABLE IF NOT EXISTS conversations (
+		id         BIGSERIAL    PRIMARY KEY,
+		name       VARCHAR(100),
+		is_group   BOOLEAN      NOT NULL DEFAULT FALSE,
+		created_at TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+		updated_at TIMESTAMPTZ  NOT NULL DEFAULT NOW()
+	)`,
+
+	// Conversation participants
+	`CREATE TABLE IF NOT EXISTS conversation_participants (
+		user_id         BIGINT       NOT NULL REFERENCES users(id),
+		conversation_id BIGINT       NOT NULL REFERENCES conversations(id),
+		last_read_at    TIMESTAMPTZ,
+		joined_at       TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+		PRIMARY KEY (user_id, conversation_id)
+	)`,
+
+	// Messages
+	`CREATE TABLE IF NOT EXISTS messages (
+		id              BIGSERIAL    PRIMARY KEY,
+		content         TEXT         NOT NULL,
+		conversation_id BIGINT       NOT NULL REFERENCES conversations(id),
+		sender_id       BIGINT       NOT NULL REFERENCES users(id),
+		created_at      TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+		file_path       TEXT,
+		file_type       TEXT,
+		fully_read_at   TIMESTAMPTZ,
+		is_deleted      BOOLEAN      NOT NULL DEFAULT FALSE,
+		is_edited       BOOLEAN      NOT NULL DEFAULT FALSE,
+		is_read         BOOLEAN      NOT NULL DEFAULT FALSE,
+		reply_to_id     BIGINT       REFERENCES messages(id)
+	)`,
+
+	// Add columns missing from messages tables created by an older schema;
+	// one ALTER takes the table lock once for all of them.
+	`ALTER TABLE messages
+		ADD COLUMN IF NOT EXISTS reply_to_id BIGINT REFERENCES messages(id),
+		ADD COLUMN IF NOT EXISTS is_edited   BOOLEAN NOT NULL DEFAULT FALSE,
+		ADD COLUMN IF NOT EXISTS is_read     BOOLEAN NOT NULL DEFAULT FALSE`,
+
+	// Per-user soft deletes ("delete for me")
+	`CREATE TABLE IF NOT EXISTS user_deleted_messages (
+		user_id    BIGINT      NOT NULL REFERENCES users(id),
+		message_id BIGINT      NOT NULL REFERENCES messages(id),
+		deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+		PRIMARY KEY (user_id, message_id)
+	)`,
+
+	// Attachments
+	`CREATE TABLE IF NOT EXISTS attachments (
+		id            BIGSERIAL   PRIMARY KEY,
+		message_id    BIGINT      NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+		file_path     TEXT        NOT NULL,
+		original_name TEXT        NOT NULL,
+		file_size     BIGINT      NOT NULL,
+		file_type     TEXT        NOT NULL,
+		mime_type     TEXT        NOT NULL,
+		read_count    INT         NOT NULL DEFAULT 0,
+		created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW()
+	)`,
+
+	// Indexes
+	`CREATE INDEX IF NOT EXISTS idx_users_username ON users(username)`,
+	`CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)`,
+	`CREATE INDEX IF NOT EXISTS idx_users_is_online ON users(is_online)`,
+	`CREATE INDEX IF NOT EXISTS idx_conversations_is_group ON conversations(is_group)`,
+	`CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations(updated_at DESC)`,
+	`CREATE INDEX IF NOT EXISTS idx_conv_participants_user ON conversation_participants(user_id)`,
+	`CREATE INDEX IF NOT EXISTS idx_conv_participants_conv ON conversation_participants(conversation_id)`,
+	`CREATE INDEX IF NOT EXISTS idx_messages_conversation_id_desc ON messages(conversation_id, id DESC)`,
+	`CREATE INDEX IF NOT EXISTS idx_messages_conversation_created_at ON messages(conversation_id, created_at)`,
+	`CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages(sender_id)`,
+	// Superseded by the composite indexes above: every message query filters
+	// on conversation_id first, and these only cost writes on each insert.
+	`DROP INDEX IF EXISTS idx_messages_conversation`,
+	`DROP INDEX IF EXISTS idx_messages_created_at`,
+	`CREATE INDEX IF NOT EXISTS idx_attachments_message_id ON attachments(message_id)`,
+
+	// Push subscriptions for Web Push notifications
+	`CREATE TABLE IF NOT EXISTS push_subscriptions (
+		id         BIGSERIAL   PRIMARY KEY,
+		user_id    BIGINT      NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+		endpoint   TEXT        NOT NULL,
+		p256dh     TEXT        NOT NULL,
+		auth       TEXT        NOT NULL,
+		user_agent TEXT,
+		created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+		UNIQUE (user_id, endpoint)
+	)`,
+	`CREATE INDEX IF NOT EXISTS idx_push_subscriptions_user ON push_subscriptions(user_id)`,
+
+	// Message reactions
+	`CREATE TABLE IF NOT EXISTS message_reactions (
+		id         BIGSERIAL    PRIMARY KEY,
+		message_id BIGINT       NOT NULL REFERENCES messages(id) ON DELETE CASCADE,
+		user_id    BIGINT       NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+		emoji      VARCHAR(32)  NOT NULL,
+		created_at TIMESTAMPTZ  NOT NULL DEFAULT NOW(),
+		UNIQUE(message_id, user_id, emoji)
+	)`,
+	`CREATE INDEX IF NOT EXISTS idx_message_reactions_message ON message_reactions(message_id)`,
+
+	// Ensure message FK in user_deleted_messages cascades on delete.
+	// Only rebuild it when it doesn't already: re-adding a foreign key
+	// validates every row of the table.
+	`DO $$
+	BEGIN
+		IF NOT EXISTS (
+			SELECT 1
+			FROM pg_constraint
+			WHERE conrelid = 'user_deleted_messages'::regclass
+			  AND conname = 'user_deleted_messages_message_id_fkey'
+			  AND confdeltype = 'c'
+		) THEN
+			ALTER TABLE user_deleted_messages
+			DROP CONSTRAINT IF EXISTS user_deleted_messages_message_id_fkey;
 
 			ALTER TABLE user_deleted_messages
 			ADD CONSTRAINT user_deleted_messages_message_id_fkey
 			FOREIGN KEY (message_id) REFERENCES messages(id) ON DELETE CASCADE;
-		EXCEPTION
-			WHEN duplicate_object THEN
-				NULL;
-		END
-		$$`,
+		END IF;
+	EXCEPTION
+		WHEN duplicate_object THEN
+			NULL;
+	END
+	$$`,
+}
+
+// schemaVersion is a checksum of migrations, so any change to them makes
+// existing databases migrate again; a database already at this version
+// skips them. It is masked to fit the INTEGER column.
+var schemaVersion = int(crc32.ChecksumIEEE([]byte(strings.Join(migrations, ";\n"))) & 0x7fffffff)
+
+// schemaStatements is migrations followed by recording schemaVersion, in
+// the same transaction as the DDL.
+var schemaStatements = append(migrations[:len(migrations):len(migrations)],
+	`CREATE TABLE IF NOT EXISTS schema_meta (
+		id      BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+		version INTEGER NOT NULL
+	)`,
+	fmt.Sprintf(`INSERT INTO schema_meta (id, version) VALUES (TRUE, %d)
+	ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version`, schemaVersion),
+)
+
+// migrationScript is schemaStatements joined once for the single round-trip run.
+var migrationScript = strings.Join(schemaStatements, ";\n")
+
+// Migrate runs idempotent DDL migrations for the zchat schema on PostgreSQL.
+func Migrate(db *sql.DB) error {
+	// Steady-state startups find the schema current and skip the DDL.
+	// Any error (typically schema_meta not existing yet) means migrate.
+	var current int
+	if err := db.QueryRow(`SELECT version FROM schema_meta`).Scan(&current); err == nil && current == schemaVersion {
+		log.Printf("Database schema is current (version %d)", current)
+		return nil
 	}
 
+	log.Print("Migrating database...")
+	// Send the whole script in one round trip: pgx uses the simple query
+	// protocol for argument-less Exec, which accepts several statements.
+	// PostgreSQL runs a multi-statement simple query as one transaction.
+	if _, err := db.Exec(migrationScript); err != nil {
+		// The batched error doesn't say which statement failed; rerun
+		// them one by one to pinpoint it.
+		log.Printf("migrate: batched run failed (%v); retrying statement by statement", err)
+		if err := migrateStatements(db, schemaStatements); err != nil {
+			return err
+		}
+	}
+	log.Print("Database migraton completed")
+	return nil
+}
+
+// migrateStatements runs stmts one at a time inside a single transaction: a
+// single commit, and a failed migration leaves the schema as it was.
+func migrateStatements(db *sql.DB, stmts []string) error {
+	tx, err := db.Begin()
+	if err != nil {
+		return fmt.Errorf("migrate: begin: %w", err)
+	}
+	defer tx.Rollback()
+
 	for _, stmt := range stmts {
 		log.Printf("migrating: executing statement:\n%s", stmt)
-		if _, err := db.Exec(stmt); err != nil {
+		if _, err := tx.Exec(stmt); err != nil {
 			return fmt.Errorf("migrate: %w\nSQL: %s", err, stmt)
 		}
 	}
-	log.Print("Database migraton completed")
+	if err := tx.Commit(); err != nil {
+		return fmt.Errorf("migrate: commit: %w", err)
+	}
 	return nil
 }
@@ -4,8 +4,6 @@ import (
 	"context"
 	"database/sql"
 	"fmt"
-	"strconv"
-	"strings"
 
 	"backend/internal/domain"
 )
@@ -161,7 +159,7 @@ func (r *MessageRepo) ListForConversationForUser(ctx context.Context, conversati
 		       ON udm.message_id = m.id AND udm.user_id = $2
 		WHERE m.conversation_id = $1
 		  AND udm.user_id IS NULL
-		ORDER BY m.created_at DESC
+		ORDER BY m.id DESC
 		LIMIT $3
 	`, conversationID, userID, limit)
 	if err != nil {
@@ -192,7 +190,7 @@ func (r *MessageRepo) ListForConversationForUserBefore(ctx context.Context, conv
 		WHERE m.conversation_id = $1
 		  AND udm.user_id IS NULL
 		  AND m.id < $4
-		ORDER BY m.created_at DESC
+		ORDER BY m.id DESC
 		LIMIT $3
 	`, conversationID, userID, limit, beforeID)
 	if err != nil {
@@ -211,12 +209,70 @@ func (r *MessageRepo) ListForConversationForUserBefore(ctx context.Context, conv
 	return messages, nil
 }
 
-func (r *MessageRepo) MarkAllReadInConversation(ctx context.Context, conversationID, senderExcludeID int64) error {
-	_, err := r.db.ExecContext(ctx, `
-		UPDATE messages SET is_read=TRUE
-		WHERE conversation_id=$1 AND sender_id!=$2 AND is_read=FALSE AND is_deleted=FALSE
-	`, conversationID, senderExcludeID)
-	return err
+// ListLatestForConversationsForUser returns the newest message of each given
+// conversation that the user has not deleted "for me", keyed by conversation ID.
+func (r *MessageRepo) ListLatestForConversationsForUser(ctx context.Context, conversationIDs []int64, userID int64) (map[int64]*domain.Message, error) {
+	res := make(map[int64]*domain.Message, len(conversationIDs))
+	if len(conversationIDs) == 0 {
+		return res, nil
+	}
+	// One LIMIT 1 probe per conversation on (conversation_id, id DESC), so
+	// the cost follows the number of conversations, not their message count.
+	rows, err := r.db.QueryContext(ctx, `
+		SELECT m.id, m.content, m.conversation_id, m.sender_id, m.created_at,
+		       m.file_path, m.file_type, m.fully_read_at, m.is_deleted, m.is_edited, m.is_read, m.reply_to_id
+		FROM unnest($1::bigint[]) AS c(id)
+		CROSS JOIN LATERAL (
+			SELECT * FROM messages m
+			WHERE m.conversation_id = c.id
+			  AND NOT EXISTS (
+				  SELECT 1 FROM user_deleted_messages udm
+				  WHERE udm.message_id = m.id AND udm.user_id = $2
+			  )
+			ORDER BY m.id DESC
+			LIMIT 1
+		) m
+	`, conversationIDs, userID)
+	if err != nil {
+		return nil, fmt.Errorf("list latest messages: %w", err)
+	}
+	messages, err := r.scanMessages(rows)
+	if err != nil {
+		return nil, err
+	}
+	if err := r.populateAttachments(ctx, messages); err != nil {
+		return nil, fmt.Errorf("populate attachments: %w", err)
+	}
+	if err := r.populateReactions(ctx, messages); err != nil {
+		return nil, fmt.Errorf("populate reactions: %w", err)
+	}
+	for _, m := range messages {
+		res[m.ConversationID] = m
+	}
+	return res, nil
+}
+
+// MarkAllReadInConversation marks messages from other senders as read on
+// behalf of readerID, but only if readerID participates in the conversation.
+// Membership check and update run as one statement; the result reports
+// whether the reader is a participant.
+func (r *MessageRepo) MarkAllReadInConversation(ctx context.Context, conversationID, readerID int64) (bool, error) {
+	var isParticipant bool
+	err := r.db.QueryRowContext(ctx, `
+		WITH member AS (
+			SELECT 1 FROM conversation_participants
+			WHERE conversation_id = $1 AND user_id = $2
+		), upd AS (
+			UPDATE messages SET is_read=TRUE
+			WHERE conversation_id=$1 AND sender_id!=$2 AND is_read=FALSE AND is_deleted=FALSE
+			  AND EXISTS (SELECT 1 FROM member)
+		)
+		SELECT EXISTS (SELECT 1 FROM member)
+	`, conversationID, readerID).Scan(&isParticipant)
+	if err != nil {
+		return false, fmt.Errorf("mark messages read: %w", err)
+	}
+	return isParticipant, nil
 }
 
 func (r *MessageRepo) PruneOld(ctx context.Context, conversationID int64, keepLimit int) error {
@@ -292,21 +348,14 @@ func (r *MessageRepo) populateAttachments(ctx context.Context, messages []*domai
 		m.Attachments = []domain.Attachment{}
 	}
 
-	args := make([]interface{}, len(msgIDs))
-	placeholders := make([]string, len(msgIDs))
-	for i, id := range msgIDs {
-		args[i] = id
-		placeholders[i] = "$" + strconv.Itoa(i+1)
-	}
-
-	query := fmt.Sprintf(`
+	// A single array parameter keeps the query text constant, so the driver
+	// reuses one prepared statement whatever the page size.
+	rows, err := r.db.QueryContext(ctx, `
 		SELECT id, message_id, file_path, original_name, file_size, file_type, mime_type, read_count, created_at
 		FROM attachments
-		WHERE message_id IN (%s)
+		WHERE message_id = ANY($1::bigint[])
 		ORDER BY created_at ASC
-	`, strings.Join(placeholders, ","))
-
-	rows, err := r.db.QueryContext(ctx, query, args...)
+	`, msgIDs)
 	if err != nil {
 		return fmt.Errorf("query attachments: %w", err)
 	}
@@ -334,74 +383,17 @@ func (r *MessageRepo) populateReactions(ctx context.Context, messages []*domain.
 	}
 
 	msgIDs := make([]int64, len(messages))
-	msgMap := make(map[int64]*domain.Message)
 	for i, m := range messages {
 		msgIDs[i] = m.ID
-		msgMap[m.ID] = m
-		m.Reactions = []domain.ReactionSummary{}
 	}
-
-	args := make([]interface{}, len(msgIDs))
-	placeholders := make([]string, len(msgIDs))
-	for i, id := range msgIDs {
-		args[i] = id
-		placeholders[i] = "$" + strconv.Itoa(i+1)
-	}
-
-	query := fmt.Sprintf(`
-		SELECT message_id, emoji, user_id
-		FROM message_reactions
-		WHERE message_id IN (%s)
-		ORDER BY message_id, created_at ASC
-	`, strings.Join(placeholders, ","))
-
-	rrows, err := r.db.QueryContext(ctx, query, args...)
+	summaries, err := reactionSummaries(ctx, r.db, msgIDs)
 	if err != nil {
-		return fmt.Errorf("query reactions: %w", err)
-	}
-	defer rrows.Close()
-
-	type emojiKey struct {
-		msgID int64
-		emoji string
-	}
-	emojiUsers := make(map[emojiKey][]int64)
-	msgEmojiOrder := make(map[int64][]string)
-
-	for rrows.Next() {
-		var msgID, userID int64
-		var emoji string
-		if err := rrows.Scan(&msgID, &emoji, &userID); err != nil {
-			return fmt.Errorf("scan reaction row: %w", err)
-		}
-		k := emojiKey{msgID: msgID, emoji: emoji}
-		if _, ok := emojiUsers[k]; !ok {
-			msgEmojiOrder[msgID] = append(msgEmojiOrder[msgID], emoji)
-		}
-		emojiUsers[k] = append(emojiUsers[k], userID)
-	}
-	if err := rrows.Err(); err != nil {
 		return err
 	}
-
-	for msgID, emojis := range msgEmojiOrder {
-		m, ok := msgMap[msgID]
-		if !ok {
-			continue
-		}
-		seen := make(map[string]bool)
-		for _, e := range emojis {
-			if seen[e] {
-				continue
-			}
-			seen[e] = true
-			k := emojiKey{msgID: msgID, emoji: e}
-			uids := emojiUsers[k]
-			m.Reactions = append(m.Reactions, domain.ReactionSummary{
-				Emoji:   e,
-				Count:   len(uids),
-				UserIDs: uids,
-			})
+	for _, m := range messages {
+		m.Reactions = summaries[m.ID]
+		if m.Reactions == nil {
+			m.Reactions = []domain.ReactionSummary{}
 		}
 	}
 	return nil
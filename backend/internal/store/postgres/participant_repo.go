@@ -20,7 +20,7 @@ var _ domain.ParticipantRepository = (*ParticipantRepo)(nil)
 
 func (r *ParticipantRepo) ListParticipants(ctx context.Context, conversationID int64) ([]*domain.User, error) {
 	rows, err := r.db.QueryContext(ctx, `
-		SELECT u.id, u.username, u.email, u.hashed_password, u.is_active, u.is_online, u.created_at, u.last_seen
+		SELECT u.id, u.username, u.email, u.is_active, u.is_online, u.created_at, u.last_seen
 		FROM users u
 		JOIN conversation_participants cp ON cp.user_id = u.id
 		WHERE cp.conversation_id = $1
@@ -29,10 +29,63 @@ func (r *ParticipantRepo) ListParticipants(ctx context.Context, conversationID i
 	if err != nil {
 		return nil, fmt.Errorf("list participants: %w", err)
 	}
+	return scanPublicUsers(rows, 0)
+}
+
+// ListParticipantsForConversations loads the participants of several
+// conversations in one query, keyed by conversation ID.
+func (r *ParticipantRepo) ListParticipantsForConversations(ctx context.Context, conversationIDs []int64) (map[int64][]*domain.User, error) {
+	res := make(map[int64][]*domain.User, len(conversationIDs))
+	if len(conversationIDs) == 0 {
+		return res, nil
+	}
+	rows, err := r.db.QueryContext(ctx, `
+		SELECT cp.conversation_id,
+		       u.id, u.username, u.email, u.is_active, u.is_online, u.created_at, u.last_seen
+		FROM users u
+		JOIN conversation_participants cp ON cp.user_id = u.id
+		WHERE cp.conversation_id = ANY($1::bigint[])
+		ORDER BY cp.conversation_id, u.username ASC
+	`, conversationIDs)
+	if err != nil {
+		return nil, fmt.Errorf("list participants: %w", err)
+	}
 	defer rows.Close()
 
-	repo := &UserRepo{db: r.db}
-	return repo.scanUsers(rows)
+	for rows.Next() {
+		var convID int64
+		u := &domain.User{}
+		if err := rows.Scan(
+			&convID,
+			&u.ID, &u.Username, &u.Email,
+			&u.IsActive, &u.IsOnline, &u.CreatedAt, &u.LastSeen,
+		); err != nil {
+			return nil, fmt.Errorf("scan participant: %w", err)
+		}
+		res[convID] = append(res[convID], u)
+	}
+	return res, rows.Err()
+}
+
+// ListParticipantIDs returns just the user IDs in a conversation (for WS
+// broadcasts and membership checks, without joining users).
+func (r *ParticipantRepo) ListParticipantIDs(ctx context.Context, conversationID int64) ([]int64, error) {
+	rows, err := r.db.QueryContext(ctx, `
+		SELECT user_id FROM conversation_participants WHERE conversation_id = $1
+	`, conversationID)
+	if err != nil {
+		return nil, fmt.Errorf("list participant ids: %w", err)
+	}
+	defer rows.Close()
+	var ids []int64
+	for rows.Next() {
+		var id int64
+		if err := rows.Scan(&id); err != nil {
+			return nil, fmt.Errorf("scan participant id: %w", err)
+		}
+		ids = append(ids, id)
+	}
+	return ids, rows.Err()
 }
 
 func (r *ParticipantRepo) IsParticipant(ctx context.Context, conversationID, userID int64) (bool, error) {
@@ -71,24 +124,3 @@ func (r *UserDeletedMessageRepo) Create(ctx context.Context, userID, messageID i
 	}
 	return nil
 }
-
-// ListConversationParticipantIDs returns just the user IDs in a conversation
-// (useful for WS broadcasts without loading full User structs).
-func ListConversationParticipantIDs(ctx context.Context, db *sql.DB, conversationID int64) ([]int64, error) {
-	rows, err := db.QueryContext(ctx, `
-		SELECT user_id FROM conversation_participants WHERE conversation_id = $1
-	`, conversationID)
-	if err != nil {
-		return nil, fmt.Errorf("list participant ids: %w", err)
-	}
-	defer rows.Close()
-	var ids []int64
-	for rows.Next() {
-		var id int64
-		if err := rows.Scan(&id); err != nil {
-			return nil, err
-		}
-		ids = append(ids, id)
-	}
-	return ids, rows.Err()
-}
@@ -4,8 +4,6 @@ import (
 	"context"
 	"database/sql"
 	"fmt"
-	"strconv"
-	"strings"
 
 	"backend/internal/domain"
 )
@@ -51,25 +49,25 @@ func (r *ReactionRepo) Toggle(ctx context.Context, userID, messageID int64, emoj
 
 // GetSummaryByMessages fetches aggregated reactions for the given message IDs.
 func (r *ReactionRepo) GetSummaryByMessages(ctx context.Context, messageIDs []int64) (map[int64][]domain.ReactionSummary, error) {
+	return reactionSummaries(ctx, r.db, messageIDs)
+}
+
+// reactionSummaries aggregates reactions per message, preserving the order in
+// which each emoji was first used. Shared with MessageRepo so message loads
+// and reaction toggles produce identical summaries.
+func reactionSummaries(ctx context.Context, db *sql.DB, messageIDs []int64) (map[int64][]domain.ReactionSummary, error) {
 	if len(messageIDs) == 0 {
 		return map[int64][]domain.ReactionSummary{}, nil
 	}
 
-	args := make([]interface{}, len(messageIDs))
-	placeholders := make([]string, len(messageIDs))
-	for i, id := range messageIDs {
-		args[i] = id
-		placeholders[i] = "$" + strconv.Itoa(i+1)
-	}
-
-	query := fmt.Sprintf(`
+	// Passing the IDs as one array keeps the query text constant, so the
+	// driver reuses a single prepared statement for every batch size.
+	rows, err := db.QueryContext(ctx, `
 		SELECT message_id, emoji, user_id
 		FROM message_reactions
-		WHERE message_id IN (%s)
+		WHERE message_id = ANY($1::bigint[])
 		ORDER BY message_id, created_at ASC
-	`, strings.Join(placeholders, ","))
-
-	rows, err := r.db.QueryContext(ctx, query, args...)
+	`, messageIDs)
 	if err != nil {
 		return nil, fmt.Errorf("query reactions: %w", err)
 	}
@@ -47,9 +47,33 @@ func (r *UserRepo) GetByEmail(ctx context.Context, email string) (*domain.User,
 		 FROM users WHERE email = $1`, email)
 }
 
+// GetUsernamesByIDs resolves usernames for a set of user IDs in one query.
+// IDs that do not exist are simply absent from the result.
+func (r *UserRepo) GetUsernamesByIDs(ctx context.Context, ids []int64) (map[int64]string, error) {
+	res := make(map[int64]string, len(ids))
+	if len(ids) == 0 {
+		return res, nil
+	}
+	rows, err := r.db.QueryContext(ctx,
+		`SELECT id, username FROM users WHERE id = ANY($1::bigint[])`, ids)
+	if err != nil {
+		return nil, fmt.Errorf("get usernames: %w", err)
+	}
+	defer rows.Close()
+	for rows.Next() {
+		var id int64
+		var username string
+		if err := rows.Scan(&id, &username); err != nil {
+			return nil, fmt.Errorf("scan username: %w", err)
+		}
+		res[id] = username
+	}
+	return res, rows.Err()
+}
+
 func (r *UserRepo) ListActive(ctx context.Context, offset, limit int) ([]*domain.User, error) {
 	rows, err := r.db.QueryContext(ctx, `
-		SELECT id, username, email, hashed_password, is_active, is_online, created_at, last_seen
+		SELECT id, username, email, is_active, is_online, created_at, last_seen
 		FROM users
 		WHERE is_active = TRUE
 		ORDER BY created_at ASC
@@ -58,12 +82,12 @@ func (r *UserRepo) ListActive(ctx context.Context, offset, limit int) ([]*domain
 	if err != nil {
 		return nil, fmt.Errorf("list active users: %w", err)
 	}
-	return r.scanUsers(rows)
+	return scanPublicUsers(rows, limit)
 }
 
 func (r *UserRepo) ListOnline(ctx context.Context) ([]*domain.User, error) {
 	rows, err := r.db.QueryContext(ctx, `
-		SELECT id, username, email, hashed_password, is_active, is_online, created_at, last_seen
+		SELECT id, username, email, is_active, is_online, created_at, last_seen
 		FROM users
 		WHERE is_active = TRUE AND is_online = TRUE
 		ORDER BY last_seen DESC
@@ -71,7 +95,7 @@ func (r *UserRepo) ListOnline(ctx context.Context) ([]*domain.User, error) {
 	if err != nil {
 		return nil, fmt.Errorf("list online users: %w", err)
 	}
-	return r.scanUsers(rows)
+	return scanPublicUsers(rows, 0)
 }
 
 func (r *UserRepo) Update(ctx context.Context, u *domain.User) error {
@@ -95,6 +119,18 @@ func (r *UserRepo) SetOnlineStatus(ctx context.Context, id int64, isOnline bool)
 	return err
 }
 
+// SetOfflineMany marks several users offline in one statement.
+func (r *UserRepo) SetOfflineMany(ctx context.Context, ids []int64) error {
+	if len(ids) == 0 {
+		return nil
+	}
+	_, err := r.db.ExecContext(ctx,
+		`UPDATE users SET is_online = FALSE, last_seen = NOW() WHERE id = ANY($1::bigint[])`,
+		ids,
+	)
+	return err
+}
+
 func (r *UserRepo) ResetAllOnlineStatus(ctx context.Context) error {
 	_, err := r.db.ExecContext(ctx,
 		`UPDATE users SET is_online = FALSE, last_seen = NOW() WHERE is_online = TRUE`)
@@ -133,3 +169,22 @@ func (r *UserRepo) scanUsers(rows *sql.Rows) ([]*domain.User, error) {
 	}
 	return users, rows.Err()
 }
+
+// scanPublicUsers scans rows selected without hashed_password, for read paths
+// that only render users (participant lists, user listings). sizeHint
+// preallocates the result when the caller knows the expected row count.
+func scanPublicUsers(rows *sql.Rows, sizeHint int) ([]*domain.User, error) {
+	defer rows.Close()
+	users := make([]*domain.User, 0, max(sizeHint, 0))
+	for rows.Next() {
+		u := &domain.User{}
+		if err := rows.Scan(
+			&u.ID, &u.Username, &u.Email,
+			&u.IsActive, &u.IsOnline, &u.CreatedAt, &u.LastSeen,
+		); err != nil {
+			return nil, fmt.Errorf("scan user: %w", err)
+		}
+		users = append(users, u)
+	}
+	return users, rows.Err()
+}
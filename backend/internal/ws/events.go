@@ -0,0 +1,323 @@
+package ws
+
+import (
+	"context"
+	"fmt"
+	"log"
+	"sync"
+	"time"
+
+	"github.com/gorilla/websocket"
+
+	webpush "github.com/SherClockHolmes/webpush-go"
+
+	"backend/internal/domain"
+	"backend/internal/service"
+)
+
+const (
+	// typingThrottle is the minimum gap between typing broadcasts for one
+	// conversation from one connection; clients emit typing per keystroke.
+	typingThrottle = 500 * time.Millisecond
+	// markReadDebounce collapses bursts of mark_read (fired while scrolling)
+	// into one UPDATE and one messages_read broadcast.
+	markReadDebounce = 100 * time.Millisecond
+	// eventTimeout bounds the database work done for one inbound event.
+	eventTimeout = 10 * time.Second
+)
+
+// session holds the per-connection state the event handlers need.
+type session struct {
+	hub     *Hub
+	msgSvc  *service.MessageService
+	pushSvc *service.PushService
+	conn    *websocket.Conn
+	user    *domain.User
+
+	// typingSentAt is only touched by the read loop, so it needs no lock.
+	typingSentAt map[int64]time.Time
+
+	// readPending is shared with the debounce timers.
+	readMu      sync.Mutex
+	readPending map[int64]bool
+}
+
+func newSession(hub *Hub, msgSvc *service.MessageService, pushSvc *service.PushService, conn *websocket.Conn, user *domain.User) *session {
+	return &session{
+		hub:          hub,
+		msgSvc:       msgSvc,
+		pushSvc:      pushSvc,
+		conn:         conn,
+		user:         user,
+		typingSentAt: make(map[int64]time.Time),
+		readPending:  make(map[int64]bool),
+	}
+}
+
+// eventHandler processes one inbound event for a session.
+type eventHandler func(s *session, ctx context.Context, ev *inboundEvent)
+
+// eventHandlers maps an inbound event type to its handler. Dispatch is a
+// single map lookup regardless of how many event types exist.
+var eventHandlers = map[string]eventHandler{
+	"message":        (*session).handleMessage,
+	"mark_read":      (*session).handleMarkRead,
+	"typing":         (*session).handleTyping,
+	"edit_message":   (*session).handleEditMessage,
+	"delete_message": (*session).handleDeleteMessage,
+	"react_message":  (*session).handleReactMessage,
+	"call_offer":     (*session).handleCallSignal,
+	"call_answer":    (*session).handleCallSignal,
+	"ice_candidate":  (*session).handleCallSignal,
+	"call_end":       (*session).handleCallSignal,
+	"call_rejected":  (*session).handleCallSignal,
+}
+
+// ── send message ─────────────────────────────────────────────────────────────
+func (s *session) handleMessage(ctx context.Context, ev *inboundEvent) {
+	content, filePath, fileType := ev.Content, ev.FilePath, ev.FileType
+	var replyToID *int64
+	if ev.ReplyToID > 0 {
+		replyToID = &ev.ReplyToID
+	}
+	if ev.ConversationID == 0 || (content == "" && filePath == "") {
+		s.sendError("message requires conversation_id and non-empty content or file")
+		return
+	}
+	var fpPtr, ftPtr *string
+	if filePath != "" {
+		fpPtr = &filePath
+	}
+	if fileType != "" {
+		ftPtr = &fileType
+	}
+	msg, err := s.msgSvc.CreateMessage(ctx, service.MessageCreateInput{
+		ConversationID: ev.ConversationID,
+		Content:        content,
+		FilePath:       fpPtr,
+		FileType:       ftPtr,
+		ReplyToID:      replyToID,
+	}, s.user.ID)
+	if err != nil {
+		log.Printf("ws: create message: %v", err)
+		s.sendError("failed to send message")
+		return
+	}
+	resp := s.msgSvc.ToAuthoredResponse(msg, s.user.Username, content)
+	participantIDs, err := s.msgSvc.GetParticipantIDs(ctx, resp.ConversationID)
+	if err != nil {
+		log.Printf("ws: get participants: %v", err)
+		return
+	}
+	s.hub.BroadcastToUsers(participantIDs, messageEvent{
+		Type:           "message",
+		ConversationID: resp.ConversationID,
+		MessageID:      resp.ID,
+		Content:        resp.Content,
+		SenderID:       resp.SenderID,
+		SenderUsername: resp.SenderUsername,
+		Timestamp:      resp.CreatedAt,
+		FilePath:       resp.FilePath,
+		FileType:       resp.FileType,
+		IsDeleted:      resp.IsDeleted,
+		IsRead:         false,
+		ReplyToID:      resp.ReplyToID,
+	})
+
+	// Push notifications to offline participants
+	if s.pushSvc != nil {
+		var offlineIDs []int64
+		for _, pid := range participantIDs {
+			if pid != s.user.ID && !s.hub.IsOnline(pid) {
+				offlineIDs = append(offlineIDs, pid)
+			}
+		}
+		if len(offlineIDs) > 0 {
+			body := resp.Content
+			if resp.FilePath != nil {
+				body = "Sent a file"
+			}
+			if len(body) > 80 {
+				body = body[:80] + "…"
+			}
+			s.pushSvc.NotifyUsersAsync(offlineIDs, service.NotificationPayload{
+				Title: resp.SenderUsername,
+				Body:  body,
+				URL:   fmt.Sprintf("/chat/%d", resp.ConversationID),
+				Tag:   "msg",
+			}, webpush.UrgencyNormal, 3600)
+		}
+	}
+}
+
+// ── mark read ────────────────────────────────────────────────────────────────
+// The first mark_read for a conversation schedules a flush; any that arrive
+// before it runs are absorbed. The flush marks everything unread at that
+// moment, so nothing requested during the window is lost.
+func (s *session) handleMarkRead(_ context.Context, ev *inboundEvent) {
+	convID := ev.ConversationID
+	if convID == 0 {
+		return
+	}
+	s.readMu.Lock()
+	pending := s.readPending[convID]
+	s.readPending[convID] = true
+	s.readMu.Unlock()
+	if pending {
+		return
+	}
+	time.AfterFunc(markReadDebounce, func() { s.flushMarkRead(convID) })
+}
+
+func (s *session) flushMarkRead(convID int64) {
+	s.readMu.Lock()
+	delete(s.readPending, convID)
+	s.readMu.Unlock()
+
+	ctx, cancel := context.WithTimeout(context.Background(), eventTimeout)
+	defer cancel()
+	if err := s.msgSvc.MarkAllReadInConversation(ctx, convID, s.user.ID); err != nil {
+		log.Printf("ws: mark_read: %v", err)
+		s.sendError("failed to mark messages as read")
+		return
+	}
+	participantIDs, _ := s.msgSvc.GetParticipantIDs(ctx, convID)
+	s.hub.BroadcastToUsers(participantIDs, messagesReadEvent{
+		Type:           "messages_read",
+		ConversationID: convID,
+		UserID:         s.user.ID,
+	})
+}
+
+// ── typing indicator ─────────────────────────────────────────────────────────
+func (s *session) handleTyping(ctx context.Context, ev *inboundEvent) {
+	convID := ev.ConversationID
+	if convID == 0 {
+		return
+	}
+	now := time.Now()
+	if now.Sub(s.typingSentAt[convID]) < typingThrottle {
+		return
+	}
+	participantIDs, err := s.msgSvc.GetParticipantIDs(ctx, convID)
+	if err != nil || !userInParticipants(s.user.ID, participantIDs) {
+		s.sendError("not allowed for this conversation")
+		return
+	}
+	s.typingSentAt[convID] = now
+	s.hub.BroadcastToUsersExcept(participantIDs, s.user.ID, typingEvent{
+		Type:           "typing",
+		ConversationID: convID,
+		UserID:         s.user.ID,
+		Username:       s.user.Username,
+	})
+}
+
+// ── edit message ─────────────────────────────────────────────────────────────
+func (s *session) handleEditMessage(ctx context.Context, ev *inboundEvent) {
+	if ev.MessageID == 0 || ev.Content == "" {
+		return
+	}
+	updated, err := s.msgSvc.EditMessage(ctx, s.user.ID, ev.MessageID, ev.Content)
+	if err != nil {
+		log.Printf("ws: edit_message: %v", err)
+		s.sendError("failed to edit message")
+		return
+	}
+	resp := s.msgSvc.ToAuthoredResponse(updated, s.user.Username, ev.Content)
+	participantIDs, _ := s.msgSvc.GetParticipantIDs(ctx, updated.ConversationID)
+	s.hub.BroadcastToUsers(participantIDs, messageEditedEvent{
+		Type:           "message_edited",
+		MessageID:      updated.ID,
+		ConversationID: updated.ConversationID,
+		Content:        resp.Content,
+		IsEdited:       true,
+	})
+}
+
+// ── delete message ───────────────────────────────────────────────────────────
+func (s *session) handleDeleteMessage(ctx context.Context, ev *inboundEvent) {
+	deleteType := service.DeleteType(ev.DeleteType)
+	if deleteType == "" {
+		deleteType = service.DeleteForMe
+	}
+	if ev.MessageID == 0 {
+		return
+	}
+	result, err := s.msgSvc.DeleteMessage(ctx, s.user.ID, ev.MessageID, deleteType)
+	if err != nil {
+		log.Printf("ws: delete_message: %v", err)
+		s.sendError("failed to delete message")
+		return
+	}
+	if deleteType == service.DeleteForEveryone {
+		participantIDs, _ := s.msgSvc.GetParticipantIDs(ctx, result.ConversationID)
+		s.hub.BroadcastToUsers(participantIDs, messageDeletedEvent{
+			Type:           "message_deleted",
+			MessageID:      ev.MessageID,
+			ConversationID: result.ConversationID,
+			DeleteType:     service.DeleteForEveryone,
+		})
+	} else {
+		s.hub.BroadcastToUsers([]int64{s.user.ID}, messageDeletedEvent{
+			Type:           "message_deleted",
+			MessageID:      ev.MessageID,
+			ConversationID: result.ConversationID,
+			DeleteType:     service.DeleteForMe,
+		})
+	}
+}
+
+// ── react to message ─────────────────────────────────────────────────────────
+func (s *session) handleReactMessage(ctx context.Context, ev *inboundEvent) {
+	if ev.MessageID == 0 || ev.Emoji == "" {
+		s.sendError("react_message requires message_id and emoji")
+		return
+	}
+	reactions, convID, err := s.msgSvc.ToggleReaction(ctx, s.user.ID, ev.MessageID, ev.Emoji)
+	if err != nil {
+		log.Printf("ws: react_message: %v", err)
+		s.sendError("failed to react to message")
+		return
+	}
+	participantIDs, _ := s.msgSvc.GetParticipantIDs(ctx, convID)
+	s.hub.BroadcastToUsers(participantIDs, reactionUpdatedEvent{
+		Type:           "reaction_updated",
+		MessageID:      ev.MessageID,
+		ConversationID: convID,
+		Reactions:      reactions,
+	})
+}
+
+// ── WebRTC signaling ─────────────────────────────────────────────────────────
+func (s *session) handleCallSignal(ctx context.Context, ev *inboundEvent) {
+	convID, targetID := ev.ConversationID, ev.TargetUserID
+	if targetID == 0 || convID == 0 {
+		s.sendError("call signaling requires target_user_id and conversation_id")
+		return
+	}
+	participantIDs, err := s.msgSvc.GetParticipantIDs(ctx, convID)
+	if err != nil || !userInParticipants(s.user.ID, participantIDs) || !userInParticipants(targetID, participantIDs) {
+		s.sendError("not allowed for this conversation")
+		return
+	}
+	s.hub.BroadcastToUsers([]int64{targetID}, callSignalEvent{
+		Type:           ev.Type,
+		ConversationID: convID,
+		SenderID:       s.user.ID,
+		SenderUsername: s.user.Username,
+		TargetUserID:   targetID,
+		SDP:            ev.SDP,
+		Candidate:      ev.Candidate,
+	})
+
+	// Push notification for offline call target
+	if s.pushSvc != nil && ev.Type == "call_offer" && !s.hub.IsOnline(targetID) {
+		s.pushSvc.NotifyUsersAsync([]int64{targetID}, service.NotificationPayload{
+			Title: s.user.Username + " is calling",
+			Body:  "Tap to answer",
+			URL:   fmt.Sprintf("/call/%d", convID),
+			Tag:   "call",
+		}, webpush.UrgencyHigh, 30)
+	}
+}
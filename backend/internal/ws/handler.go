@@ -1,23 +1,32 @@
 package ws
 
 import (
+	"bytes"
 	"context"
+	"encoding/json"
+	"errors"
 	"fmt"
 	"log"
 	"net/http"
 	"net/url"
 	"strings"
+	"sync"
 	"time"
 
 	"github.com/gorilla/websocket"
 
-	webpush "github.com/SherClockHolmes/webpush-go"
-
 	"backend/internal/domain"
 	"backend/internal/security"
 	"backend/internal/service"
 )
 
+const (
+	wsBufferSize = 4096
+	// maxInboundFrameSize caps a client frame: a 5000-character message or
+	// an SDP offer fits comfortably, anything larger closes the connection.
+	maxInboundFrameSize = 64 << 10
+)
+
 type wsAuthError struct {
 	status int
 	msg    string
@@ -91,6 +100,24 @@ func extractTokenFromWSRequest(r *http.Request) (string, error) {
 	return "", wsAuthError{status: http.StatusUnauthorized, msg: "missing bearer token"}
 }
 
+// inboundEvent is the union of the fields clients send in any event. Decoding
+// into a struct avoids allocating a map[string]any and boxing every value
+// per frame; fields an event doesn't use are left at their zero value.
+type inboundEvent struct {
+	Type           string          `json:"type"`
+	ConversationID int64           `json:"conversation_id"`
+	MessageID      int64           `json:"message_id"`
+	TargetUserID   int64           `json:"target_user_id"`
+	ReplyToID      int64           `json:"reply_to_id"`
+	Content        string          `json:"content"`
+	FilePath       string          `json:"file_path"`
+	FileType       string          `json:"file_type"`
+	DeleteType     string          `json:"delete_type"`
+	Emoji          string          `json:"emoji"`
+	SDP            json.RawMessage `json:"sdp"`       // forwarded verbatim
+	Candidate      json.RawMessage `json:"candidate"` // forwarded verbatim
+}
+
 func userInParticipants(userID int64, participantIDs []int64) bool {
 	for _, pid := range participantIDs {
 		if pid == userID {
@@ -121,13 +148,23 @@ func MakeHandler(
 	pongTimeout time.Duration,
 ) http.HandlerFunc {
 	checkOrigin := makeCheckOrigin(allowedOrigins)
+	// Compression stays off (the gorilla default): outbound frames are
+	// small JSON broadcast to many recipients, where deflate is pure CPU.
+	// Idle connections greatly outnumber writing ones, so write buffers
+	// are pooled rather than held per connection.
 	upgrader := websocket.Upgrader{
-		CheckOrigin: checkOrigin,
+		CheckOrigin:     checkOrigin,
+		ReadBufferSize:  wsBufferSize,
+		WriteBufferSize: wsBufferSize,
+		WriteBufferPool: &sync.Pool{},
 		Subprotocols: []string{
 			"bearer",
 		},
 	}
 
+	offline := newOfflineWriter(hub, users)
+	presence := newPresenceBatcher(hub)
+
 	return func(w http.ResponseWriter, r *http.Request) {
 		if !checkOrigin(r) {
 			http.Error(w, "origin not allowed", http.StatusForbidden)
@@ -155,8 +192,15 @@ func MakeHandler(
 			return
 		}
 
+		// Resolve by primary key when the token carries it; tokens issued
+		// before the uid claim existed fall back to the username.
 		ctx := r.Context()
-		user, err := users.GetByUsername(ctx, sub)
+		var user *domain.User
+		if uid, ok := security.UserIDFromClaims(claims); ok {
+			user, err = users.GetByID(ctx, uid)
+		} else {
+			user, err = users.GetByUsername(ctx, sub)
+		}
 		if err != nil || user == nil || !user.IsActive {
 			http.Error(w, "user not found or inactive", http.StatusUnauthorized)
 			return
@@ -167,6 +211,7 @@ func MakeHandler(
 			return
 		}
 		defer conn.Close()
+		conn.SetReadLimit(maxInboundFrameSize)
 
 		// Each connection gets a dedicated write goroutine to avoid blocking
 		// the hub's Run loop and to satisfy gorilla's no-concurrent-writes rule.
@@ -181,302 +226,70 @@ func MakeHandler(
 			return nil
 		})
 
-		if err := users.SetOnlineStatus(context.Background(), user.ID, true); err != nil {
-			log.Printf("ws: set online for %d: %v", user.ID, err)
+		// Additional connections (another tab or device) leave the stored
+		// status alone and don't re-announce the user.
+		if hub.Register(user.ID, conn, send) {
+			if err := users.SetOnlineStatus(context.Background(), user.ID, true); err != nil {
+				log.Printf("ws: set online for %d: %v", user.ID, err)
+			}
+			presence.announce(presenceEvent{Type: "user_online", UserID: user.ID, Username: user.Username})
 		}
-		hub.Register(user.ID, conn, send)
 		defer func() {
 			hub.Unregister(user.ID, conn)
 			// Only mark user offline in DB and broadcast if they have no remaining connections.
 			if !hub.IsOnline(user.ID) {
-				if err := users.SetOnlineStatus(context.Background(), user.ID, false); err != nil {
-					log.Printf("ws: set offline for %d: %v", user.ID, err)
-				}
-				hub.BroadcastAll(map[string]any{
-					"type":     "user_offline",
-					"user_id":  user.ID,
-					"username": user.Username,
-				})
+				offline.markOffline(user.ID)
+				presence.announce(presenceEvent{Type: "user_offline", UserID: user.ID, Username: user.Username})
 			}
 		}()
-		hub.BroadcastAll(map[string]any{
-			"type":     "user_online",
-			"user_id":  user.ID,
-			"username": user.Username,
-		})
 
+		sess := newSession(hub, msgSvc, pushSvc, conn, user)
+		// The frame buffer and event are reused across iterations; handlers
+		// finish with ev before the next read, and Unmarshal copies strings
+		// and raw fields out of the buffer.
+		var frame bytes.Buffer
+		var ev inboundEvent
 		for {
-			var payload map[string]any
-			if err := conn.ReadJSON(&payload); err != nil {
+			// Read the whole frame and decode it separately so that a
+			// malformed payload is reported to the client instead of being
+			// treated as a broken connection.
+			_, rd, err := conn.NextReader()
+			if err != nil {
 				break
 			}
-			// Use a fresh context for each message — the original HTTP request
-			// context may carry a timeout that expires long before the WebSocket
-			// connection is closed.
-			ctx := context.Background()
-			msgType, _ := payload["type"].(string)
-			switch msgType {
-
-			// ── send message ─────────────────────────────────────────────────
-			case "message":
-				convIDf, _ := payload["conversation_id"].(float64)
-				content, _ := payload["content"].(string)
-				filePath, _ := payload["file_path"].(string)
-				fileType, _ := payload["file_type"].(string)
-				var replyToID *int64
-				if rID, ok := payload["reply_to_id"].(float64); ok && rID > 0 {
-					val := int64(rID)
-					replyToID = &val
-				}
-				if convIDf == 0 || (content == "" && filePath == "") {
-					sendError(conn, "message requires conversation_id and non-empty content or file")
-					continue
-				}
-				var fpPtr, ftPtr *string
-				if filePath != "" {
-					fpPtr = &filePath
-				}
-				if fileType != "" {
-					ftPtr = &fileType
-				}
-				msg, err := msgSvc.CreateMessage(ctx, service.MessageCreateInput{
-					ConversationID: int64(convIDf),
-					Content:        content,
-					FilePath:       fpPtr,
-					FileType:       ftPtr,
-					ReplyToID:      replyToID,
-				}, user.ID)
-				if err != nil {
-					log.Printf("ws: create message: %v", err)
-					sendError(conn, "failed to send message")
-					continue
-				}
-				resp, err := msgSvc.ToResponse(ctx, msg)
-				if err != nil {
-					log.Printf("ws: ToResponse: %v", err)
-					continue
-				}
-				participantIDs, err := msgSvc.GetParticipantIDs(ctx, resp.ConversationID)
-				if err != nil {
-					log.Printf("ws: get participants: %v", err)
-					continue
-				}
-				hub.BroadcastToUsers(participantIDs, map[string]any{
-					"type":            "message",
-					"conversation_id": resp.ConversationID,
-					"message_id":      resp.ID,
-					"content":         resp.Content,
-					"sender_id":       resp.SenderID,
-					"sender_username": resp.SenderUsername,
-					"timestamp":       resp.CreatedAt,
-					"file_path":       resp.FilePath,
-					"file_type":       resp.FileType,
-					"is_deleted":      resp.IsDeleted,
-					"is_read":         false,
-					"reply_to_id":     resp.ReplyToID,
-				})
-
-				// Push notifications to offline participants
-				if pushSvc != nil {
-					var offlineIDs []int64
-					for _, pid := range participantIDs {
-						if pid != user.ID && !hub.IsOnline(pid) {
-							offlineIDs = append(offlineIDs, pid)
-						}
-					}
-					if len(offlineIDs) > 0 {
-						body := resp.Content
-						if resp.FilePath != nil {
-							body = "Sent a file"
-						}
-						if len(body) > 80 {
-							body = body[:80] + "…"
-						}
-						pushSvc.NotifyUsersAsync(offlineIDs, service.NotificationPayload{
-							Title: resp.SenderUsername,
-							Body:  body,
-							URL:   fmt.Sprintf("/chat/%d", resp.ConversationID),
-							Tag:   "msg",
-						}, webpush.UrgencyNormal, 3600)
-					}
-				}
-
-			// ── mark read ────────────────────────────────────────────────────
-			case "mark_read":
-				convIDf, _ := payload["conversation_id"].(float64)
-				if convIDf == 0 {
-					continue
-				}
-				convID := int64(convIDf)
-				if err := msgSvc.MarkAllReadInConversation(ctx, convID, user.ID); err != nil {
-					log.Printf("ws: mark_read: %v", err)
-					sendError(conn, "failed to mark messages as read")
-					continue
-				}
-				participantIDs, _ := msgSvc.GetParticipantIDs(ctx, convID)
-				hub.BroadcastToUsers(participantIDs, map[string]any{
-					"type":            "messages_read",
-					"conversation_id": convID,
-					"user_id":         user.ID,
-				})
-
-			// ── typing indicator ─────────────────────────────────────────────
-			case "typing":
-				convIDf, _ := payload["conversation_id"].(float64)
-				if convIDf == 0 {
-					continue
-				}
-				convID := int64(convIDf)
-				participantIDs, err := msgSvc.GetParticipantIDs(ctx, convID)
-				if err != nil || !userInParticipants(user.ID, participantIDs) {
-					sendError(conn, "not allowed for this conversation")
-					continue
-				}
-				var others []int64
-				for _, pid := range participantIDs {
-					if pid != user.ID {
-						others = append(others, pid)
-					}
-				}
-				hub.BroadcastToUsers(others, map[string]any{
-					"type":            "typing",
-					"conversation_id": convID,
-					"user_id":         user.ID,
-					"username":        user.Username,
-				})
-
-			// ── edit message ─────────────────────────────────────────────────
-			case "edit_message":
-				msgIDf, _ := payload["message_id"].(float64)
-				content, _ := payload["content"].(string)
-				if msgIDf == 0 || content == "" {
-					continue
-				}
-				updated, err := msgSvc.EditMessage(ctx, user.ID, int64(msgIDf), content)
-				if err != nil {
-					log.Printf("ws: edit_message: %v", err)
-					sendError(conn, "failed to edit message")
-					continue
-				}
-				resp, _ := msgSvc.ToResponse(ctx, updated)
-				participantIDs, _ := msgSvc.GetParticipantIDs(ctx, updated.ConversationID)
-				var broadcastContent string
-				if resp != nil {
-					broadcastContent = resp.Content
-				}
-				hub.BroadcastToUsers(participantIDs, map[string]any{
-					"type":            "message_edited",
-					"message_id":      updated.ID,
-					"conversation_id": updated.ConversationID,
-					"content":         broadcastContent,
-					"is_edited":       true,
-				})
-
-			// ── delete message ───────────────────────────────────────────────
-			case "delete_message":
-				msgIDf, _ := payload["message_id"].(float64)
-				deleteType, _ := payload["delete_type"].(string)
-				if deleteType == "" {
-					deleteType = "for_me"
-				}
-				if msgIDf == 0 {
-					continue
-				}
-				result, err := msgSvc.DeleteMessage(ctx, user.ID, int64(msgIDf), deleteType)
-				if err != nil {
-					log.Printf("ws: delete_message: %v", err)
-					sendError(conn, "failed to delete message")
-					continue
-				}
-				if deleteType == "for_everyone" {
-					participantIDs, _ := msgSvc.GetParticipantIDs(ctx, result.ConversationID)
-					hub.BroadcastToUsers(participantIDs, map[string]any{
-						"type":            "message_deleted",
-						"message_id":      int64(msgIDf),
-						"conversation_id": result.ConversationID,
-						"delete_type":     "for_everyone",
-					})
-				} else {
-					hub.BroadcastToUsers([]int64{user.ID}, map[string]any{
-						"type":            "message_deleted",
-						"message_id":      int64(msgIDf),
-						"conversation_id": result.ConversationID,
-						"delete_type":     "for_me",
-					})
-				}
-
-			// ── react to message ─────────────────────────────────────────────
-			case "react_message":
-				msgIDf, _ := payload["message_id"].(float64)
-				emoji, _ := payload["emoji"].(string)
-				if msgIDf == 0 || emoji == "" {
-					sendError(conn, "react_message requires message_id and emoji")
-					continue
-				}
-				reactions, convID, err := msgSvc.ToggleReaction(ctx, user.ID, int64(msgIDf), emoji)
-				if err != nil {
-					log.Printf("ws: react_message: %v", err)
-					sendError(conn, "failed to react to message")
-					continue
-				}
-				participantIDs, _ := msgSvc.GetParticipantIDs(ctx, convID)
-				hub.BroadcastToUsers(participantIDs, map[string]any{
-					"type":            "reaction_updated",
-					"message_id":      int64(msgIDf),
-					"conversation_id": convID,
-					"reactions":       reactions,
-				})
-
-			// ── WebRTC signaling ─────────────────────────────────────────────
-			case "call_offer", "call_answer", "ice_candidate", "call_end", "call_rejected":
-				targetIDf, _ := payload["target_user_id"].(float64)
-				convIDf, _ := payload["conversation_id"].(float64)
-				if targetIDf == 0 || convIDf == 0 {
-					sendError(conn, "call signaling requires target_user_id and conversation_id")
-					continue
-				}
-				convID := int64(convIDf)
-				targetID := int64(targetIDf)
-				participantIDs, err := msgSvc.GetParticipantIDs(ctx, convID)
-				if err != nil || !userInParticipants(user.ID, participantIDs) || !userInParticipants(targetID, participantIDs) {
-					sendError(conn, "not allowed for this conversation")
+			frame.Reset()
+			if _, err := frame.ReadFrom(rd); err != nil {
+				break
+			}
+			ev = inboundEvent{}
+			if err := json.Unmarshal(frame.Bytes(), &ev); err != nil {
+				// A field of the wrong JSON type leaves that field zeroed,
+				// matching the old type-assertion behaviour.
+				var typeErr *json.UnmarshalTypeError
+				if !errors.As(err, &typeErr) {
+					sess.sendError("invalid JSON")
 					continue
 				}
-				fwd := map[string]any{
-					"type":            msgType,
-					"conversation_id": convID,
-					"sender_id":       user.ID,
-					"sender_username": user.Username,
-					"target_user_id":  targetID,
-				}
-				if sdp, ok := payload["sdp"]; ok {
-					fwd["sdp"] = sdp
-				}
-				if candidate, ok := payload["candidate"]; ok {
-					fwd["candidate"] = candidate
-				}
-				hub.BroadcastToUsers([]int64{targetID}, fwd)
-
-				// Push notification for offline call target
-				if pushSvc != nil && msgType == "call_offer" && !hub.IsOnline(targetID) {
-					pushSvc.NotifyUsersAsync([]int64{targetID}, service.NotificationPayload{
-						Title: user.Username + " is calling",
-						Body:  "Tap to answer",
-						URL:   fmt.Sprintf("/call/%d", convID),
-						Tag:   "call",
-					}, webpush.UrgencyHigh, 30)
-				}
-
-			default:
-				log.Printf("ws: unknown event type %q from user %d", msgType, user.ID)
 			}
+			handle, ok := eventHandlers[ev.Type]
+			if !ok {
+				log.Printf("ws: unknown event type %q from user %d", ev.Type, user.ID)
+				continue
+			}
+			// Use a fresh context for each message — the original HTTP request
+			// context may carry a timeout that expires long before the WebSocket
+			// connection is closed. The deadline keeps a stalled query from
+			// wedging this connection's read loop and its pooled DB connection.
+			ctx, cancel := context.WithTimeout(context.Background(), eventTimeout)
+			handle(sess, ctx, &ev)
+			cancel()
 		}
 	}
 }
 
-func sendError(conn *websocket.Conn, msg string) {
-	_ = conn.WriteJSON(map[string]any{
-		"type":    "error",
-		"message": msg,
-	})
+// sendError reports a failed event back to the connection that sent it. The
+// frame is queued through the hub rather than written here, because writePump
+// may be writing to the same socket concurrently.
+func (s *session) sendError(msg string) {
+	s.hub.SendToConn(s.user.ID, s.conn, errorEvent{Type: "error", Message: msg})
 }
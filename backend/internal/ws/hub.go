@@ -3,6 +3,7 @@ package ws
 import (
 	"encoding/json"
 	"log"
+	"sync"
 	"time"
 
 	"github.com/gorilla/websocket"
@@ -15,30 +16,88 @@ const (
 	// sendBufSize is the number of outbound messages that can be queued per connection
 	// before the connection is considered a slow consumer and closed.
 	sendBufSize = 256
+
+	// hubQueueSize buffers broadcasts and unregisters so event handlers hand
+	// off to the Run loop without waiting for it. Register stays unbuffered:
+	// once it returns the connection is known to the hub, so nothing sent
+	// to the user afterwards can overtake it.
+	hubQueueSize = 1024
 )
 
 // Hub maintains the set of active clients and broadcasts messages to them.
 // All socket I/O is delegated to per-connection writePump goroutines so the
 // Run loop is never blocked by a slow or unresponsive client.
 type Hub struct {
-	// clients: userID → set of connections.
-	clients map[int64]map[*websocket.Conn]bool
+	// clients: userID → connection → outbound channel drained by writePump.
+	// Keeping the channel next to the connection lets a broadcast reach it
+	// with the one lookup it already does per user.
+	clients map[int64]map[*websocket.Conn]chan []byte
 
-	// sendChans: per-connection outbound channel drained by writePump.
-	sendChans map[*websocket.Conn]chan []byte
+	broadcast  chan broadcastMessage
+	register   chan registerRequest
+	unregister chan unregisterRequest
 
-	broadcast     chan broadcastMessage
-	register      chan registerRequest
-	unregister    chan unregisterRequest
-	isOnlineQuery chan isOnlineRequest
+	// presence counts live connections per user outside the Run loop so
+	// IsOnline can be answered without a round trip through it.
+	presence *presenceSet
 
 	pingInterval time.Duration
 	pongTimeout  time.Duration
 }
 
-type isOnlineRequest struct {
-	userID int64
-	reply  chan bool
+const presenceShards = 16
+
+// presenceSet is a sharded userID → connection count map. Sharding keeps
+// concurrent IsOnline checks and connects/disconnects from contending on a
+// single lock.
+type presenceSet struct {
+	shards [presenceShards]presenceShard
+}
+
+type presenceShard struct {
+	mu     sync.RWMutex
+	counts map[int64]int
+}
+
+func newPresenceSet() *presenceSet {
+	p := &presenceSet{}
+	for i := range p.shards {
+		p.shards[i].counts = make(map[int64]int)
+	}
+	return p
+}
+
+func (p *presenceSet) shard(userID int64) *presenceShard {
+	return &p.shards[uint64(userID)%presenceShards]
+}
+
+// add records a connection and reports whether it is the user's first.
+func (p *presenceSet) add(userID int64) bool {
+	sh := p.shard(userID)
+	sh.mu.Lock()
+	sh.counts[userID]++
+	first := sh.counts[userID] == 1
+	sh.mu.Unlock()
+	return first
+}
+
+func (p *presenceSet) remove(userID int64) {
+	sh := p.shard(userID)
+	sh.mu.Lock()
+	if sh.counts[userID] <= 1 {
+		delete(sh.counts, userID)
+	} else {
+		sh.counts[userID]--
+	}
+	sh.mu.Unlock()
+}
+
+func (p *presenceSet) online(userID int64) bool {
+	sh := p.shard(userID)
+	sh.mu.RLock()
+	n := sh.counts[userID]
+	sh.mu.RUnlock()
+	return n > 0
 }
 
 type registerRequest struct {
@@ -53,20 +112,21 @@ type unregisterRequest struct {
 }
 
 type broadcastMessage struct {
-	targetUserIDs []int64 // if nil, broadcast to all
-	payload       any
+	targetUserIDs []int64         // if nil, broadcast to all
+	conn          *websocket.Conn // if set, deliver only to this connection of targetUserIDs[0]
+	exceptUserID  int64           // if non-zero, skipped among targetUserIDs
+	data          []byte          // pre-encoded JSON payload
 }
 
 func NewHub(pingInterval, pongTimeout time.Duration) *Hub {
 	return &Hub{
-		clients:       make(map[int64]map[*websocket.Conn]bool),
-		sendChans:     make(map[*websocket.Conn]chan []byte),
-		broadcast:     make(chan broadcastMessage),
-		register:      make(chan registerRequest),
-		unregister:    make(chan unregisterRequest),
-		isOnlineQuery: make(chan isOnlineRequest),
-		pingInterval:  pingInterval,
-		pongTimeout:   pongTimeout,
+		clients:      make(map[int64]map[*websocket.Conn]chan []byte),
+		broadcast:    make(chan broadcastMessage, hubQueueSize),
+		register:     make(chan registerRequest),
+		unregister:   make(chan unregisterRequest, hubQueueSize),
+		presence:     newPresenceSet(),
+		pingInterval: pingInterval,
+		pongTimeout:  pongTimeout,
 	}
 }
 
@@ -75,56 +135,51 @@ func (h *Hub) Run() {
 		select {
 		case req := <-h.register:
 			if h.clients[req.userID] == nil {
-				h.clients[req.userID] = make(map[*websocket.Conn]bool)
+				h.clients[req.userID] = make(map[*websocket.Conn]chan []byte)
 			}
-			h.clients[req.userID][req.conn] = true
-			h.sendChans[req.conn] = req.send
+			h.clients[req.userID][req.conn] = req.send
 
 		case req := <-h.unregister:
 			h.removeConn(req.userID, req.conn)
 
 		case msg := <-h.broadcast:
-			data, err := json.Marshal(msg.payload)
-			if err != nil {
-				log.Printf("ws: marshal broadcast payload: %v", err)
-				continue
-			}
-			if msg.targetUserIDs == nil {
+			data := msg.data
+			if msg.conn != nil {
+				uid := msg.targetUserIDs[0]
+				if send, ok := h.clients[uid][msg.conn]; ok && !enqueue(uid, send, data) {
+					h.removeConn(uid, msg.conn)
+				}
+			} else if msg.targetUserIDs == nil {
 				for uid, conns := range h.clients {
-					for conn := range conns {
-						if !h.enqueue(uid, conn, data) {
+					for conn, send := range conns {
+						if !enqueue(uid, send, data) {
 							h.removeConn(uid, conn)
 						}
 					}
 				}
 			} else {
 				for _, uid := range msg.targetUserIDs {
+					if uid == msg.exceptUserID {
+						continue
+					}
 					if conns, ok := h.clients[uid]; ok {
-						for conn := range conns {
-							if !h.enqueue(uid, conn, data) {
+						for conn, send := range conns {
+							if !enqueue(uid, send, data) {
 								h.removeConn(uid, conn)
 							}
 						}
 					}
 				}
 			}
-
-		case req := <-h.isOnlineQuery:
-			_, online := h.clients[req.userID]
-			req.reply <- online
 		}
 	}
 }
 
 // enqueue puts data on the connection's send channel without blocking.
 // Returns false if the channel is full — the connection should be closed.
-func (h *Hub) enqueue(userID int64, conn *websocket.Conn, data []byte) bool {
-	ch, ok := h.sendChans[conn]
-	if !ok {
-		return false
-	}
+func enqueue(userID int64, send chan []byte, data []byte) bool {
 	select {
-	case ch <- data:
+	case send <- data:
 		return true
 	default:
 		log.Printf("ws: send buffer full for user %d, closing connection", userID)
@@ -137,12 +192,9 @@ func (h *Hub) enqueue(userID int64, conn *websocket.Conn, data []byte) bool {
 // Safe to call even if the connection is already removed.
 func (h *Hub) removeConn(userID int64, conn *websocket.Conn) {
 	if conns, ok := h.clients[userID]; ok {
-		if _, exists := conns[conn]; exists {
+		if send, exists := conns[conn]; exists {
 			delete(conns, conn)
-			if ch, ok := h.sendChans[conn]; ok {
-				close(ch)
-				delete(h.sendChans, conn)
-			}
+			close(send)
 			if len(conns) == 0 {
 				delete(h.clients, userID)
 			}
@@ -151,34 +203,98 @@ func (h *Hub) removeConn(userID int64, conn *websocket.Conn) {
 }
 
 // IsOnline returns true if the given user has at least one active connection.
-// Safe to call from any goroutine; it queries the Run loop via a channel.
+// Safe to call from any goroutine; it reads the sharded presence set and does
+// not involve the Run loop.
 func (h *Hub) IsOnline(userID int64) bool {
-	ch := make(chan bool, 1)
-	h.isOnlineQuery <- isOnlineRequest{userID: userID, reply: ch}
-	return <-ch
+	return h.presence.online(userID)
 }
 
-// Register adds a connection for the given user.
+// Register adds a connection for the given user and reports whether it is the
+// user's only one, i.e. whether the user just came online.
 // send is the buffered channel the writePump goroutine reads from; it must be
 // created by the caller before calling Register.
-func (h *Hub) Register(userID int64, conn *websocket.Conn, send chan []byte) {
+func (h *Hub) Register(userID int64, conn *websocket.Conn, send chan []byte) bool {
+	first := h.presence.add(userID)
 	h.register <- registerRequest{userID: userID, conn: conn, send: send}
+	return first
 }
 
-// Unregister removes a connection for the given user.
+// Unregister removes a connection for the given user. Each Register must be
+// paired with exactly one Unregister, even if the hub already dropped the
+// connection as a slow consumer; presence is counted per registration.
 func (h *Hub) Unregister(userID int64, conn *websocket.Conn) {
+	h.presence.remove(userID)
 	h.unregister <- unregisterRequest{userID: userID, conn: conn}
 }
 
 // BroadcastToUsers sends the given payload to all active connections of the
 // provided user IDs.
 func (h *Hub) BroadcastToUsers(userIDs []int64, payload any) {
-	h.broadcast <- broadcastMessage{targetUserIDs: userIDs, payload: payload}
+	if !h.anyOnline(userIDs, 0) {
+		return
+	}
+	data, ok := encodePayload(payload)
+	if !ok {
+		return
+	}
+	h.broadcast <- broadcastMessage{targetUserIDs: userIDs, data: data}
+}
+
+// BroadcastToUsersExcept is BroadcastToUsers minus one user, typically the
+// sender. It saves callers from building a filtered copy of userIDs.
+func (h *Hub) BroadcastToUsersExcept(userIDs []int64, exceptUserID int64, payload any) {
+	if !h.anyOnline(userIDs, exceptUserID) {
+		return
+	}
+	data, ok := encodePayload(payload)
+	if !ok {
+		return
+	}
+	h.broadcast <- broadcastMessage{targetUserIDs: userIDs, exceptUserID: exceptUserID, data: data}
+}
+
+// SendToConn queues the payload for a single connection of the given user.
+// Handlers use it instead of writing to the socket directly so writePump stays
+// the connection's only writer.
+func (h *Hub) SendToConn(userID int64, conn *websocket.Conn, payload any) {
+	data, ok := encodePayload(payload)
+	if !ok {
+		return
+	}
+	h.broadcast <- broadcastMessage{targetUserIDs: []int64{userID}, conn: conn, data: data}
+}
+
+// anyOnline reports whether any of userIDs other than exceptUserID has a live
+// connection. Broadcasts check it first so a conversation whose other members
+// are all offline costs neither an encode nor a trip through the Run loop.
+func (h *Hub) anyOnline(userIDs []int64, exceptUserID int64) bool {
+	for _, uid := range userIDs {
+		if uid != exceptUserID && h.presence.online(uid) {
+			return true
+		}
+	}
+	return false
 }
 
 // BroadcastAll sends the payload to all connected users.
 func (h *Hub) BroadcastAll(payload any) {
-	h.broadcast <- broadcastMessage{targetUserIDs: nil, payload: payload}
+	data, ok := encodePayload(payload)
+	if !ok {
+		return
+	}
+	h.broadcast <- broadcastMessage{targetUserIDs: nil, data: data}
+}
+
+// encodePayload marshals a broadcast payload in the caller's goroutine so the
+// Run loop only does map lookups and channel sends. Encoding once here also
+// means every recipient receives the same byte slice.
+func encodePayload(payload any) ([]byte, bool) {
+	data, err := json.Marshal(payload)
+	if err != nil {
+		log.Printf("ws: marshal broadcast payload: %v", err)
+		return nil, false
+	}
+	return data, true
 }
 
 // writePump runs as a dedicated goroutine for each WebSocket connection.
@@ -0,0 +1,78 @@
+package ws
+
+import (
+	"context"
+	"log"
+
+	"backend/internal/domain"
+)
+
+const (
+	offlineQueueSize = 1024
+	offlineBatchSize = 256
+)
+
+// offlineWriter persists "user went offline" in batches. A mass disconnect
+// (redeploy, network blip) otherwise issues one UPDATE per user at once and
+// drains the connection pool.
+type offlineWriter struct {
+	hub   *Hub
+	users domain.UserRepository
+	queue chan int64
+}
+
+func newOfflineWriter(hub *Hub, users domain.UserRepository) *offlineWriter {
+	w := &offlineWriter{
+		hub:   hub,
+		users: users,
+		queue: make(chan int64, offlineQueueSize),
+	}
+	go w.run()
+	return w
+}
+
+// markOffline queues userID for the next batch, falling back to a direct
+// write if the queue is full.
+func (w *offlineWriter) markOffline(userID int64) {
+	select {
+	case w.queue <- userID:
+	default:
+		if err := w.users.SetOnlineStatus(context.Background(), userID, false); err != nil {
+			log.Printf("ws: set offline for %d: %v", userID, err)
+		}
+	}
+}
+
+func (w *offlineWriter) run() {
+	ids := make([]int64, 0, offlineBatchSize)
+	for id := range w.queue {
+		ids = append(ids[:0], id)
+	drain:
+		for len(ids) < offlineBatchSize {
+			select {
+			case id, ok := <-w.queue:
+				if !ok {
+					break drain
+				}
+				ids = append(ids, id)
+			default:
+				break drain
+			}
+		}
+
+		// Skip users who reconnected while queued so the batch can't
+		// overwrite their fresh online status.
+		n := 0
+		for _, id := range ids {
+			if !w.hub.IsOnline(id) {
+				ids[n] = id
+				n++
+			}
+		}
+		ctx, cancel := context.WithTimeout(context.Background(), eventTimeout)
+		if err := w.users.SetOfflineMany(ctx, ids[:n]); err != nil {
+			log.Printf("ws: set offline for %d users: %v", n, err)
+		}
+		cancel()
+	}
+}
@@ -0,0 +1,88 @@
+package ws
+
+import (
+	"context"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/mock"
+
+	"backend/internal/domain"
+)
+
+type MockUserRepo struct {
+	mock.Mock
+}
+
+func (m *MockUserRepo) Create(ctx context.Context, u *domain.User) error { return nil }
+
+func (m *MockUserRepo) GetByID(ctx context.Context, id int64) (*domain.User, error) {
+	return nil, domain.ErrNotFound
+}
+
+func (m *MockUserRepo) GetByUsername(ctx context.Context, username string) (*domain.User, error) {
+	return nil, domain.ErrNotFound
+}
+
+func (m *MockUserRepo) GetByEmail(ctx context.Context, email string) (*domain.User, error) {
+	return nil, domain.ErrNotFound
+}
+
+func (m *MockUserRepo) GetUsernamesByIDs(ctx context.Context, ids []int64) (map[int64]string, error) {
+	return nil, nil
+}
+
+func (m *MockUserRepo) ListActive(ctx context.Context, offset, limit int) ([]*domain.User, error) {
+	return nil, nil
+}
+
+func (m *MockUserRepo) ListOnline(ctx context.Context) ([]*domain.User, error) { return nil, nil }
+
+func (m *MockUserRepo) Update(ctx context.Context, u *domain.User) error { return nil }
+
+func (m *MockUserRepo) SoftDelete(ctx context.Context, id int64) error { return nil }
+
+func (m *MockUserRepo) SetOnlineStatus(ctx context.Context, userID int64, isOnline bool) error {
+	args := m.Called(ctx, userID, isOnline)
+	return args.Error(0)
+}
+
+func (m *MockUserRepo) SetOfflineMany(ctx context.Context, ids []int64) error {
+	// The writer reuses its batch slice; record a copy.
+	args := m.Called(ctx, append([]int64(nil), ids...))
+	return args.Error(0)
+}
+
+func (m *MockUserRepo) ResetAllOnlineStatus(ctx context.Context) error { return nil }
+
+func TestOfflineWriterSkipsReconnectedUsers(t *testing.T) {
+	hub := NewHub(time.Minute, time.Minute)
+	users := new(MockUserRepo)
+	users.On("SetOfflineMany", mock.Anything, []int64{1, 3}).Return(nil).Once()
+
+	w := &offlineWriter{hub: hub, users: users, queue: make(chan int64, offlineQueueSize)}
+	w.markOffline(1)
+	w.markOffline(2)
+	w.markOffline(3)
+	// User 2 reconnects before the batch is written.
+	hub.presence.add(2)
+
+	close(w.queue)
+	w.run()
+
+	users.AssertExpectations(t)
+	users.AssertNumberOfCalls(t, "SetOfflineMany", 1)
+}
+
+func TestOfflineWriterFallsBackWhenQueueFull(t *testing.T) {
+	hub := NewHub(time.Minute, time.Minute)
+	users := new(MockUserRepo)
+	users.On("SetOnlineStatus", mock.Anything, int64(2), false).Return(nil).Once()
+
+	w := &offlineWriter{hub: hub, users: users, queue: make(chan int64, 1)}
+	w.markOffline(1)
+	w.markOffline(2)
+
+	users.AssertExpectations(t)
+	users.AssertNotCalled(t, "SetOfflineMany", mock.Anything, mock.Anything)
+}
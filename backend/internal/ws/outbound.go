@@ -0,0 +1,87 @@
+package ws
+
+import (
+	"encoding/json"
+	"time"
+
+	"backend/internal/domain"
+	"backend/internal/service"
+)
+
+// Outbound event payloads. The JSON field names are the wire protocol the
+// clients parse; encoding a struct avoids building a map[string]any per event.
+
+type messageEvent struct {
+	Type           string    `json:"type"`
+	ConversationID int64     `json:"conversation_id"`
+	MessageID      int64     `json:"message_id"`
+	Content        string    `json:"content"`
+	SenderID       int64     `json:"sender_id"`
+	SenderUsername string    `json:"sender_username"`
+	Timestamp      time.Time `json:"timestamp"`
+	FilePath       *string   `json:"file_path"`
+	FileType       *string   `json:"file_type"`
+	IsDeleted      bool      `json:"is_deleted"`
+	IsRead         bool      `json:"is_read"`
+	ReplyToID      *int64    `json:"reply_to_id"`
+}
+
+type messagesReadEvent struct {
+	Type           string `json:"type"`
+	ConversationID int64  `json:"conversation_id"`
+	UserID         int64  `json:"user_id"`
+}
+
+type typingEvent struct {
+	Type           string `json:"type"`
+	ConversationID int64  `json:"conversation_id"`
+	UserID         int64  `json:"user_id"`
+	Username       string `json:"username"`
+}
+
+type messageEditedEvent struct {
+	Type           string `json:"type"`
+	MessageID      int64  `json:"message_id"`
+	ConversationID int64  `json:"conversation_id"`
+	Content        string `json:"content"`
+	IsEdited       bool   `json:"is_edited"`
+}
+
+type messageDeletedEvent struct {
+	Type           string             `json:"type"`
+	MessageID      int64              `json:"message_id"`
+	ConversationID int64              `json:"conversation_id"`
+	DeleteType     service.DeleteType `json:"delete_type"`
+}
+
+type reactionUpdatedEvent struct {
+	Type           string                   `json:"type"`
+	MessageID      int64                    `json:"message_id"`
+	ConversationID int64                    `json:"conversation_id"`
+	Reactions      []domain.ReactionSummary `json:"reactions"`
+}
+
+// callSignalEvent forwards call_offer / call_answer / ice_candidate /
+// call_end / call_rejected; sdp and candidate are only present when the
+// sender supplied them.
+type callSignalEvent struct {
+	Type           string          `json:"type"`
+	ConversationID int64           `json:"conversation_id"`
+	SenderID       int64           `json:"sender_id"`
+	SenderUsername string          `json:"sender_username"`
+	TargetUserID   int64           `json:"target_user_id"`
+	SDP            json.RawMessage `json:"sdp,omitempty"`
+	Candidate      json.RawMessage `json:"candidate,omitempty"`
+}
+
+// presenceEvent is user_online / user_offline.
+type presenceEvent struct {
+	Type     string `json:"type"`
+	UserID   int64  `json:"user_id"`
+	Username string `json:"username"`
+}
+
+type errorEvent struct {
+	Type    string `json:"type"`
+	Message string `json:"message"`
+}
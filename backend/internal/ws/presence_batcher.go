@@ -0,0 +1,53 @@
+package ws
+
+import (
+	"sync"
+	"time"
+)
+
+// presenceWindow is how long presence changes are held before broadcasting.
+// A reconnect (page reload, network switch) inside the window produces no
+// user_offline/user_online pair at all.
+const presenceWindow = 200 * time.Millisecond
+
+// presenceBatcher coalesces user_online / user_offline broadcasts, each of
+// which goes to every connected client.
+type presenceBatcher struct {
+	hub *Hub
+
+	mu        sync.Mutex
+	pending   map[int64]presenceEvent
+	scheduled bool
+}
+
+func newPresenceBatcher(hub *Hub) *presenceBatcher {
+	return &presenceBatcher{hub: hub, pending: make(map[int64]presenceEvent)}
+}
+
+// announce queues ev. An opposite change already pending for the same user
+// cancels out, since clients never saw the first one.
+func (b *presenceBatcher) announce(ev presenceEvent) {
+	b.mu.Lock()
+	defer b.mu.Unlock()
+	if prev, ok := b.pending[ev.UserID]; ok && prev.Type != ev.Type {
+		delete(b.pending, ev.UserID)
+		return
+	}
+	b.pending[ev.UserID] = ev
+	if !b.scheduled {
+		b.scheduled = true
+		time.AfterFunc(presenceWindow, b.flush)
+	}
+}
+
+func (b *presenceBatcher) flush() {
+	b.mu.Lock()
+	pending := b.pending
+	b.pending = make(map[int64]presenceEvent)
+	b.scheduled = false
+	b.mu.Unlock()
+
+	for _, ev := range pending {
+		b.hub.BroadcastAll(ev)
+	}
+}
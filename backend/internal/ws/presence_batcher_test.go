@@ -0,0 +1,78 @@
+package ws
+
+import (
+	"encoding/json"
+	"testing"
+	"time"
+
+	"github.com/stretchr/testify/assert"
+	"github.com/stretchr/testify/require"
+)
+
+// flushedPresence waits past the batching window and returns the presence
+// events the batcher handed to the hub, keyed by user ID.
+func flushedPresence(t *testing.T, hub *Hub) map[int64]presenceEvent {
+	time.Sleep(2 * presenceWindow)
+	res := map[int64]presenceEvent{}
+	for {
+		select {
+		case msg := <-hub.broadcast:
+			assert.Nil(t, msg.targetUserIDs, "presence goes to every client")
+			var ev presenceEvent
+			require.NoError(t, json.Unmarshal(msg.data, &ev))
+			_, dup := res[ev.UserID]
+			assert.False(t, dup, "more than one event for user %d", ev.UserID)
+			res[ev.UserID] = ev
+		default:
+			return res
+		}
+	}
+}
+
+func online(id int64) presenceEvent {
+	return presenceEvent{Type: "user_online", UserID: id, Username: "u"}
+}
+
+func offline(id int64) presenceEvent {
+	return presenceEvent{Type: "user_offline", UserID: id, Username: "u"}
+}
+
+func TestPresenceBatcherOnlineOfflineOnline(t *testing.T) {
+	hub := NewHub(time.Minute, time.Minute)
+	b := newPresenceBatcher(hub)
+
+	b.announce(online(1))
+	b.announce(offline(1))
+	b.announce(online(1))
+
+	got := flushedPresence(t, hub)
+	assert.Equal(t, map[int64]presenceEvent{1: online(1)}, got)
+}
+
+func TestPresenceBatcherReconnectCancelsOut(t *testing.T) {
+	hub := NewHub(time.Minute, time.Minute)
+	b := newPresenceBatcher(hub)
+
+	b.announce(offline(1))
+	b.announce(online(1))
+
+	assert.Empty(t, flushedPresence(t, hub))
+}
+
+func TestPresenceBatcherMixedUsers(t *testing.T) {
+	hub := NewHub(time.Minute, time.Minute)
+	b := newPresenceBatcher(hub)
+
+	b.announce(offline(1))
+	b.announce(online(2))
+	b.announce(online(1))
+	b.announce(offline(3))
+
+	got := flushedPresence(t, hub)
+	assert.Equal(t, map[int64]presenceEvent{2: online(2), 3: offline(3)}, got)
+
+	// A change after the flush starts a new window.
+	b.announce(offline(2))
+	got = flushedPresence(t, hub)
+	assert.Equal(t, map[int64]presenceEvent{2: offline(2)}, got)
+}